@@ -3,42 +3,138 @@ Gateway configuration utilities for writing dynamic environment variables.
 
 This module handles writing secrets (tokens, API keys) to an environment file
 that gets loaded by the supervised gateway wrapper script.
+
+The file holds `export KEY="VALUE"` lines. The wrapper reads them line by
+line and exports each pair without `source`-ing the file, so values are never
+evaluated by a shell. The export/quote syntax is kept so that wrappers
+generated before that change, which still `source` the file, keep exporting
+the variables to the gateway.
+
+The gateway is spawned by supervisord, not by the backend, so secrets cannot
+be handed over through an inherited fd or a Popen env. The file is the
+hand-off point: it is written atomically with mode 0600 and scrubbed when the
+gateway is stopped.
 """
 
+import functools
+import logging
 import os
-import re
+import secrets
 import stat
 from pathlib import Path
 
-__all__ = ["write_gateway_env", "clear_gateway_env", "sanitize_shell_value"]
+__all__ = ["write_gateway_env", "clear_gateway_env", "sanitize_shell_value", "atomic_write"]
+
+logger = logging.getLogger(__name__)
+
+
+@functools.cache
+def _env_dir() -> str:
+    """
+    Directory holding the gateway environment file.
+
+    Uses the CLAWDBOT_HOME env var if set, otherwise falls back to ~/.clawdbot.
+    Resolved lazily on first use so importing this module does no path work.
+    """
+    return os.environ.get("CLAWDBOT_HOME") or os.path.expanduser("~/.clawdbot")
+
+
+@functools.cache
+def _env_file() -> str:
+    """Path to the gateway environment file."""
+    return os.path.join(_env_dir(), "gateway.env")
+
+
+# Env file templates, precomputed per provider so only the values vary per call.
+# Every keyed template exports the generic PROVIDER_API_KEY (referenced as
+# ${PROVIDER_API_KEY} in clawdbot.json) plus the provider-specific variable.
+_ENV_TEMPLATE_TOKEN_ONLY = 'export CLAWDBOT_GATEWAY_TOKEN="{t}"\n'
+_ENV_TEMPLATE_DEFAULT = _ENV_TEMPLATE_TOKEN_ONLY + 'export PROVIDER_API_KEY="{k}"\n'
+_ENV_TEMPLATES = {
+    "emergent": _ENV_TEMPLATE_DEFAULT,
+    "anthropic": _ENV_TEMPLATE_DEFAULT + 'export ANTHROPIC_API_KEY="{k}"\n',
+    "openai": _ENV_TEMPLATE_DEFAULT + 'export OPENAI_API_KEY="{k}"\n',
+    "openrouter": _ENV_TEMPLATE_DEFAULT + 'export OPENROUTER_API_KEY="{k}"\n',
+}
 
-# Path to the gateway environment file
-# Use CLAWDBOT_HOME env var if set, otherwise fall back to ~/.clawdbot
-GATEWAY_ENV_DIR = os.environ.get("CLAWDBOT_HOME") or os.path.expanduser("~/.clawdbot")
-GATEWAY_ENV_FILE = os.path.join(GATEWAY_ENV_DIR, "gateway.env")
+# Set once the env directory has been created, so later writes skip the mkdir
+_dir_ready = False
 
-# Strict pattern for values that are safe to put in shell export statements
-# Only allow alphanumeric, dashes, underscores, dots, colons, slashes, and plus signs
-_SAFE_SHELL_VALUE_RE = re.compile(r'^[a-zA-Z0-9\-_.:+/=]+$')
+# Strict allowlist for values that are safe to put in shell export statements
+# Only allow alphanumeric, dashes, underscores, dots, colons, slashes, plus and equals signs
+# Validation deletes every allowed byte in a single C-level translate pass;
+# anything left over is an unsafe character.
+_SAFE_SHELL_BYTES = b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_.:+/="
 
 
+@functools.lru_cache(maxsize=8)
 def sanitize_shell_value(value: str) -> str:
     """
     Validate and sanitize a value for use in a shell export statement.
 
     Raises ValueError if the value contains dangerous characters that could
     enable shell injection (quotes, backticks, $, semicolons, etc.).
+
+    Results are memoized so repeated gateway restarts with the same
+    credentials skip re-validation; clear_gateway_env() drops the cache.
     """
     if not value:
         raise ValueError("Empty value not allowed in shell export")
-    if not _SAFE_SHELL_VALUE_RE.match(value):
+    # isascii() reads a flag cached on the str object, so non-ASCII input is
+    # rejected without scanning or a failed encode
+    if not value.isascii() or value.encode("ascii").translate(None, _SAFE_SHELL_BYTES):
         raise ValueError(
-            f"Value contains unsafe characters for shell export. "
-            f"Only alphanumeric, dashes, underscores, dots, colons, slashes, plus, and equals are allowed."
+            "Value contains unsafe characters for shell export. "
+            "Only alphanumeric, dashes, underscores, dots, colons, slashes, plus, and equals are allowed."
         )
     return value
 
 
+def _fsync_dir(path: str) -> None:
+    """Best-effort fsync of a directory so a rename inside it is durable."""
+    try:
+        dir_fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        # Some filesystems (NFS, SMB) do not support fsync on directories
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def atomic_write(path: str, payload: bytes) -> None:
+    """
+    Atomically replace `path` with `payload`.
+
+    Writes to a temp file in the same directory, fsyncs it and renames it over
+    the destination, so readers never observe a truncated or partial file.
+    The temp file is created with mode 0600 so the secret is never visible
+    with permissive bits, not even briefly.
+    """
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f".{name}.{secrets.token_hex(8)}")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, stat.S_IRUSR | stat.S_IWUSR)
+    try:
+        try:
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    _fsync_dir(directory)
+
+
 def write_gateway_env(token: str, api_key: str = None, provider: str = "emergent") -> None:
     """
     Write secrets to env file before starting gateway.
@@ -54,37 +150,24 @@ def write_gateway_env(token: str, api_key: str = None, provider: str = "emergent
     Raises:
         ValueError: If token or api_key contain unsafe shell characters
     """
-    # Ensure directory exists
-    os.makedirs(GATEWAY_ENV_DIR, exist_ok=True)
+    global _dir_ready
 
-    # Sanitize all values before writing to shell export statements
-    safe_token = sanitize_shell_value(token)
+    # Ensure directory exists (only checked on the first write)
+    if not _dir_ready:
+        os.makedirs(_env_dir(), exist_ok=True)
+        _dir_ready = True
 
-    # Build environment file content
-    lines = [
-        f'export CLAWDBOT_GATEWAY_TOKEN="{safe_token}"',
-    ]
+    # Sanitize all values before writing them to the env file
+    safe_token = sanitize_shell_value(token)
 
-    # Add provider-specific API keys + generic PROVIDER_API_KEY for JSON config references
     if api_key:
-        safe_key = sanitize_shell_value(api_key)
-        # Generic key referenced as ${PROVIDER_API_KEY} in clawdbot.json
-        lines.append(f'export PROVIDER_API_KEY="{safe_key}"')
-        if provider == "anthropic":
-            lines.append(f'export ANTHROPIC_API_KEY="{safe_key}"')
-        elif provider == "openai":
-            lines.append(f'export OPENAI_API_KEY="{safe_key}"')
-        elif provider == "openrouter":
-            lines.append(f'export OPENROUTER_API_KEY="{safe_key}"')
-
-    # Write the file
-    content = "\n".join(lines) + "\n"
-
-    with open(GATEWAY_ENV_FILE, 'w') as f:
-        f.write(content)
+        template = _ENV_TEMPLATES.get(provider, _ENV_TEMPLATE_DEFAULT)
+        content = template.format(t=safe_token, k=sanitize_shell_value(api_key))
+    else:
+        content = _ENV_TEMPLATE_TOKEN_ONLY.format(t=safe_token)
 
-    # Set secure permissions (readable only by owner)
-    os.chmod(GATEWAY_ENV_FILE, stat.S_IRUSR | stat.S_IWUSR)  # 0o600
+    # Write the file (values are validated ASCII, so a single encode suffices)
+    atomic_write(_env_file(), content.encode("ascii"))
 
 
 def clear_gateway_env() -> None:
@@ -92,6 +175,28 @@ def clear_gateway_env() -> None:
     Clear the gateway environment file.
 
     Called when stopping the gateway to remove sensitive credentials.
+    The contents are overwritten with zeros before unlinking as a best-effort
+    scrub of the secrets (not a guaranteed erase on all storage).
     """
-    if os.path.exists(GATEWAY_ENV_FILE):
-        os.remove(GATEWAY_ENV_FILE)
+    # Drop references to validated secrets held by the memoization cache
+    sanitize_shell_value.cache_clear()
+
+    env_file = _env_file()
+    try:
+        fd = os.open(env_file, os.O_WRONLY)
+    except FileNotFoundError:
+        return
+    try:
+        size = os.fstat(fd).st_size
+        if size:
+            os.write(fd, b"\x00" * size)
+            os.fsync(fd)
+    except OSError as e:
+        logger.warning("Could not scrub %s before removal: %s", env_file, e)
+    finally:
+        os.close(fd)
+
+    try:
+        os.unlink(env_file)
+    except FileNotFoundError:
+        pass
@@ -125,11 +125,20 @@ export NODE_DIR=/root/nodejs
 export CLAWDBOT_DIR=/root/.clawdbot-bin
 export PATH="$NODE_DIR/bin:$CLAWDBOT_DIR:$PATH"
 
-# Source gateway environment (API keys, tokens) if available
+# Load gateway environment (API keys, tokens) if available.
+# The file holds `export KEY="VALUE"` lines; read them without evaluating the values.
 GATEWAY_ENV="${CLAWDBOT_HOME:-$HOME/.clawdbot}/gateway.env"
 if [ -f "$GATEWAY_ENV" ]; then
-    # shellcheck disable=SC1090
-    source "$GATEWAY_ENV"
+    while IFS= read -r line; do
+        # Split on the first `=` only: values may end in `=` (base64 padding)
+        key="${line%%=*}"
+        value="${line#*=}"
+        key="${key#export }"
+        value="${value%\"}"
+        value="${value#\"}"
+        [[ "$key" =~ ^[A-Z_][A-Z0-9_]*$ ]] || continue
+        export "$key=$value"
+    done < "$GATEWAY_ENV"
 fi
 
 # Find clawdbot
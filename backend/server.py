@@ -1,19 +1,26 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, APIRouter, HTTPException, WebSocket, WebSocketDisconnect, Request, Response, Query
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
+from starlette.background import BackgroundTask
 from starlette.middleware.cors import CORSMiddleware
 from starlette.websockets import WebSocketState
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DeleteMany, InsertOne, ReturnDocument
 from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
+from bson.errors import InvalidId
+import base64
+import binascii
 import hashlib
 import os
 import re
 import shutil
 import logging
-import json
+import orjson
 import secrets
 import subprocess
+import sys
 import asyncio
 import httpx
 import websockets
@@ -23,13 +30,14 @@ from pydantic import BaseModel, Field, ConfigDict, field_validator
 from typing import List, Literal, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
-from collections import defaultdict
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import time
 
 # WhatsApp monitoring
 from whatsapp_monitor import get_whatsapp_status, fix_registered_flag
 # Gateway management (supervisor-based)
-from gateway_config import write_gateway_env, clear_gateway_env
+from gateway_config import write_gateway_env, clear_gateway_env, atomic_write
 from supervisor_client import SupervisorClient
 
 ROOT_DIR = Path(__file__).parent
@@ -40,18 +48,55 @@ mongo_url = os.environ['MONGO_URL']
 mongo_client = AsyncIOMotorClient(mongo_url)
 db = mongo_client[os.environ.get('DB_NAME', 'openclaw_app')]
 
-# Shared httpx client (H5: reuse across requests instead of creating per-request)
+# Dedicated bounded pool for blocking supervisorctl and WhatsApp creds calls, so
+# they never queue behind unrelated work in the default to_thread executor.
+# Created and shut down by lifespan, like the shared httpx clients.
+_SV_POOL: Optional[ThreadPoolExecutor] = None
+
+
+async def _sv(fn, *args):
+    """Run a blocking supervisor/WhatsApp helper on _SV_POOL (default executor outside lifespan)."""
+    return await asyncio.get_running_loop().run_in_executor(_SV_POOL, fn, *args)
+
+
+# Shared httpx clients (H5: reuse across requests instead of creating per-request)
+# _http_client talks to external services (Emergent auth); _gateway_client talks
+# to the local gateway only and keeps idle keep-alive connections much longer.
 _http_client: Optional[httpx.AsyncClient] = None
+_gateway_client: Optional[httpx.AsyncClient] = None
+
+
+def _new_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(30.0, connect=3.0, write=10.0, pool=5.0),
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=50, keepalive_expiry=30.0),
+    )
+
+
+def _new_gateway_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(30.0, connect=2.0, pool=5.0),
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=50, keepalive_expiry=600.0),
+    )
+
 
+# The clients are created and closed only by lifespan(). The getters fail fast
+# instead of lazily constructing a replacement pool that nothing would close.
 
 def get_http_client() -> httpx.AsyncClient:
-    """Get the shared httpx AsyncClient instance."""
-    global _http_client
+    """Get the shared httpx AsyncClient instance for external services."""
     if _http_client is None or _http_client.is_closed:
-        _http_client = httpx.AsyncClient(timeout=30.0)
+        raise RuntimeError("HTTP client is not available outside the application lifespan")
     return _http_client
 
 
+def get_gateway_client() -> httpx.AsyncClient:
+    """Get the shared httpx AsyncClient instance for the local gateway."""
+    if _gateway_client is None or _gateway_client.is_closed:
+        raise RuntimeError("Gateway HTTP client is not available outside the application lifespan")
+    return _gateway_client
+
+
 # Moltbot Gateway Management
 MOLTBOT_PORT = 18789
 MOLTBOT_CONTROL_PORT = 18791
@@ -78,41 +123,58 @@ logger = logging.getLogger(__name__)
 # ============== Rate Limiter (H3) ==============
 
 class RateLimiter:
-    """Simple in-memory rate limiter per IP address."""
+    """Simple in-memory token-bucket rate limiter per IP address.
+
+    Each key holds a (tokens, last_refill) pair. Buckets refill continuously
+    at max_requests per window_seconds, allowing bursts of up to max_requests.
+    At most max_keys buckets are kept; the least recently seen key is evicted
+    first, so rotating source IPs cannot grow memory without bound.
+    """
 
-    def __init__(self, max_requests: int = 10, window_seconds: int = 60):
+    def __init__(self, max_requests: int = 10, window_seconds: int = 60, max_keys: int = 10_000):
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self._requests: dict[str, list[float]] = defaultdict(list)
+        self.max_keys = max_keys
+        self._refill_rate = max_requests / window_seconds
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
         self._last_cleanup = time.monotonic()
-        self._cleanup_interval = 300  # Purge stale keys every 5 minutes
+        self._cleanup_interval = 300  # Purge idle keys every 5 minutes
 
     def _maybe_cleanup(self, now: float) -> None:
-        """Periodically remove stale IP entries to prevent unbounded memory growth."""
+        """Periodically drop buckets that have fully refilled to bound memory growth."""
         if now - self._last_cleanup < self._cleanup_interval:
             return
         self._last_cleanup = now
-        window_start = now - self.window_seconds
-        stale = [k for k, v in self._requests.items() if not v or v[-1] < window_start]
+        # A bucket idle for a full window is back at capacity; dropping it is lossless
+        idle_before = now - self.window_seconds
+        stale = [k for k, (_, last) in self._buckets.items() if last < idle_before]
         for k in stale:
-            del self._requests[k]
+            del self._buckets[k]
 
     def is_allowed(self, key: str) -> bool:
         now = time.monotonic()
         self._maybe_cleanup(now)
-        window_start = now - self.window_seconds
-        # Clean old entries for this key
-        self._requests[key] = [t for t in self._requests[key] if t > window_start]
-        if len(self._requests[key]) >= self.max_requests:
-            return False
-        self._requests[key].append(now)
-        return True
+        tokens, last = self._buckets.get(key, (self.max_requests, now))
+        tokens = min(self.max_requests, tokens + (now - last) * self._refill_rate)
+        allowed = tokens >= 1
+        self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed
 
 
 auth_rate_limiter = RateLimiter(max_requests=10, window_seconds=60)
 start_rate_limiter = RateLimiter(max_requests=5, window_seconds=60)
 
 
+def _get_client_ip(req: Request) -> str:
+    """Rate-limit key for a request: the proxy-supplied real IP, else the peer address."""
+    client_ip = req.headers.get("x-real-ip") or (req.client.host if req.client else "unknown")
+    # Interned so repeated limiter lookups for the same client hit identical keys
+    return sys.intern(client_ip)
+
+
 def _mask_email(email: str) -> str:
     """Mask email for safe logging (L8)."""
     if not email or '@' not in email:
@@ -129,6 +191,12 @@ def _hash_token(token: str) -> str:
 
 # ============== Pydantic Models ==============
 
+# Validator patterns, compiled once at import
+_CLIENT_NAME_RE = re.compile(r'^[\w\s\-_.@]+$')
+_API_KEY_RE = re.compile(r'^[a-zA-Z0-9\-_.:+/=]+$')
+_MODEL_RE = re.compile(r'^[\w\-./]+$')
+
+
 class StatusCheck(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -142,7 +210,7 @@ class StatusCheckCreate(BaseModel):
     @field_validator('client_name')
     @classmethod
     def validate_client_name(cls, v: str) -> str:
-        if not re.match(r'^[\w\s\-_.@]+$', v):
+        if not _CLIENT_NAME_RE.match(v):
             raise ValueError('client_name contains invalid characters')
         return v.strip()
 
@@ -159,7 +227,7 @@ class OpenClawStartRequest(BaseModel):
             return v
         if len(v) < 10:
             raise ValueError('API key must be at least 10 characters')
-        if not re.match(r'^[a-zA-Z0-9\-_.:+/=]+$', v):
+        if not _API_KEY_RE.match(v):
             raise ValueError('API key contains invalid characters')
         return v
 
@@ -170,7 +238,7 @@ class OpenClawStartRequest(BaseModel):
             return v
         if len(v) > 200:
             raise ValueError('Model name too long')
-        if not re.match(r'^[\w\-./]+$', v):
+        if not _MODEL_RE.match(v):
             raise ValueError('Model name contains invalid characters')
         return v
 
@@ -192,6 +260,12 @@ class OpenClawStatusResponse(BaseModel):
     is_owner: Optional[bool] = None
 
 
+# Shared, never-mutated responses for the common status poll outcomes
+_STATUS_NOT_RUNNING = OpenClawStatusResponse(running=False)
+_STATUS_RUNNING_NOT_OWNER = OpenClawStatusResponse(running=True, is_owner=False)
+_STATUS_RUNNING_ANONYMOUS = OpenClawStatusResponse(running=True)
+
+
 class User(BaseModel):
     model_config = ConfigDict(extra="ignore")
     user_id: str
@@ -218,13 +292,47 @@ COOKIE_SAMESITE = os.environ.get('COOKIE_SAMESITE', 'lax')
 WS_MAX_MESSAGE_SIZE = 1 * 1024 * 1024  # 1MB
 WS_IDLE_TIMEOUT = 30 * 60  # 30 minutes
 
+# In-process session cache: token hash -> (User, serialized user, monotonic expiry).
+# Saves the session + user Mongo round-trips on every authenticated request.
+SESSION_CACHE_TTL = 60  # seconds
+SESSION_CACHE_MAX = 5000
+_session_cache: dict[str, tuple["User", dict, float]] = {}
 
-async def get_instance_owner() -> Optional[dict]:
-    """Get the instance owner from database. Returns None if not locked yet."""
+
+def _invalidate_user_sessions(user_id: str) -> None:
+    """Drop all cached sessions belonging to a user."""
+    stale = [k for k, (u, _, _) in _session_cache.items() if u.user_id == user_id]
+    for k in stale:
+        del _session_cache[k]
+
+
+# The owner is locked once and never changes, so a found owner is cached for
+# the life of the process. While unlocked, Mongo is re-checked at most every
+# INSTANCE_OWNER_RECHECK seconds.
+INSTANCE_OWNER_RECHECK = 30
+_instance_owner_cache: Optional[dict] = None
+_instance_owner_checked_at: Optional[float] = None
+
+
+async def _load_instance_owner() -> Optional[dict]:
+    """Read the instance owner from the database and refresh the cache."""
+    global _instance_owner_cache, _instance_owner_checked_at
     doc = await db.instance_config.find_one({"_id": "instance_owner"})
+    _instance_owner_cache = doc
+    _instance_owner_checked_at = time.monotonic()
     return doc
 
 
+async def get_instance_owner() -> Optional[dict]:
+    """Get the instance owner. Returns None if not locked yet."""
+    if _instance_owner_cache is not None:
+        return _instance_owner_cache
+    if (_instance_owner_checked_at is not None
+            and time.monotonic() - _instance_owner_checked_at < INSTANCE_OWNER_RECHECK):
+        return None
+    return await _load_instance_owner()
+
+
 async def set_instance_owner(user: User) -> bool:
     """Lock the instance to a specific user. Only succeeds if not already locked.
     Returns True if this user is the owner (either newly set or already was)."""
@@ -241,7 +349,7 @@ async def set_instance_owner(user: User) -> bool:
         upsert=True
     )
     # H2: Re-verify ownership after upsert to handle race condition
-    owner = await get_instance_owner()
+    owner = await _load_instance_owner()
     return owner and owner.get("user_id") == user.user_id
 
 
@@ -253,50 +361,101 @@ async def check_instance_access(user: User) -> bool:
     return owner.get("user_id") == user.user_id
 
 
-async def get_current_user(request: Request) -> Optional[User]:
+async def _fetch_session_and_user(token_hash: str, now: datetime) -> Optional[dict]:
     """
-    Get current user from session token.
-    Checks cookie first, then Authorization header as fallback.
-    Returns None if not authenticated.
-    """
-    session_token = request.cookies.get("session_token")
+    Fetch an unexpired session and its user in a single round-trip.
 
-    if not session_token:
-        auth_header = request.headers.get("Authorization")
-        if auth_header and auth_header.startswith("Bearer "):
-            session_token = auth_header.split(" ", 1)[1]
-
-    if not session_token:
-        return None
+    Returns {"expires_at": ..., "user": {...}}, or None if the session is
+    missing or expired, or its user does not exist. The match is covered by
+    the (session_token, expires_at) index and the $lookup by the unique
+    users.user_id index.
+    """
+    docs = await db.user_sessions.aggregate([
+        {"$match": {"session_token": token_hash, "expires_at": {"$gt": now}}},
+        {"$limit": 1},
+        {"$project": {"_id": 0, "user_id": 1, "expires_at": 1}},
+        {"$lookup": {
+            "from": "users",
+            "localField": "user_id",
+            "foreignField": "user_id",
+            "as": "user",
+        }},
+        {"$unwind": "$user"},
+        {"$project": {"user_id": 0, "user._id": 0}},
+    ]).to_list(1)
+    return docs[0] if docs else None
+
+
+async def _resolve_session(session_token: str) -> Optional[tuple[User, dict]]:
+    """
+    Resolve a raw session token to its user, using the in-process cache.
 
+    Returns (User, user dict) where the dict is the User already serialized
+    for API responses, or None if the session is invalid.
+    """
     # Hash token before lookup (tokens are stored hashed in DB)
     token_hash = _hash_token(session_token)
-    session_doc = await db.user_sessions.find_one(
-        {"session_token": token_hash},
-        {"_id": 0}
-    )
+
+    cached = _session_cache.get(token_hash)
+    if cached:
+        user, user_dict, cache_expires = cached
+        if cache_expires > time.monotonic():
+            return user, user_dict
+        del _session_cache[token_hash]
+
+    now = datetime.now(timezone.utc)
+    session_doc = await _fetch_session_and_user(token_hash, now)
 
     if not session_doc:
         return None
 
-    expires_at = session_doc.get("expires_at")
-    if isinstance(expires_at, str):
-        expires_at = datetime.fromisoformat(expires_at)
+    # Expiry is filtered server-side; only needed here to bound the cache TTL
+    expires_at = session_doc["expires_at"]
     if expires_at.tzinfo is None:
         expires_at = expires_at.replace(tzinfo=timezone.utc)
+    remaining = (expires_at - now).total_seconds()
 
-    if expires_at < datetime.now(timezone.utc):
-        return None
+    user = User(**session_doc["user"])
+    user_dict = user.model_dump()
+    if len(_session_cache) >= SESSION_CACHE_MAX:
+        # Evict the oldest entry (dicts preserve insertion order)
+        del _session_cache[next(iter(_session_cache))]
+    _session_cache[token_hash] = (user, user_dict, time.monotonic() + min(SESSION_CACHE_TTL, remaining))
+    return user, user_dict
 
-    user_doc = await db.users.find_one(
-        {"user_id": session_doc["user_id"]},
-        {"_id": 0}
-    )
 
-    if not user_doc:
-        return None
+async def _get_session_user(session_token: str) -> Optional[User]:
+    """Resolve a raw session token to its User."""
+    resolved = await _resolve_session(session_token)
+    return resolved[0] if resolved else None
 
-    return User(**user_doc)
+
+def _get_request_session_token(request: Request) -> Optional[str]:
+    """Session token from the cookie, falling back to the Authorization header."""
+    session_token = request.cookies.get("session_token")
+
+    if not session_token:
+        auth_header = request.headers.get("Authorization")
+        if auth_header and auth_header.startswith("Bearer "):
+            session_token = auth_header.split(" ", 1)[1]
+
+    return session_token or None
+
+
+async def get_current_user(request: Request) -> Optional[User]:
+    """
+    Get current user from session token.
+    Checks cookie first, then Authorization header as fallback.
+    Returns None if not authenticated. The result is memoized on request.state
+    so repeated checks within one request resolve the session only once.
+    """
+    if hasattr(request.state, "user"):
+        return request.state.user
+
+    session_token = _get_request_session_token(request)
+    user = await _get_session_user(session_token) if session_token else None
+    request.state.user = user
+    return user
 
 
 async def require_auth(request: Request) -> User:
@@ -313,6 +472,11 @@ async def require_auth(request: Request) -> User:
     return user
 
 
+def is_gateway_owner(user: Optional[User]) -> bool:
+    """Whether user owns the currently running gateway."""
+    return user is not None and gateway_state["owner_user_id"] == user.user_id
+
+
 async def get_ws_user(websocket: WebSocket) -> Optional[User]:
     """
     Authenticate a WebSocket connection from cookies BEFORE accept().
@@ -322,57 +486,105 @@ async def get_ws_user(websocket: WebSocket) -> Optional[User]:
     if not session_token:
         return None
 
-    # Hash token before lookup (tokens are stored hashed in DB)
-    token_hash = _hash_token(session_token)
-    session_doc = await db.user_sessions.find_one(
-        {"session_token": token_hash},
-        {"_id": 0}
-    )
-    if not session_doc:
-        return None
+    return await _get_session_user(session_token)
 
-    expires_at = session_doc.get("expires_at")
-    if isinstance(expires_at, str):
-        expires_at = datetime.fromisoformat(expires_at)
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
-    if expires_at < datetime.now(timezone.utc):
-        return None
 
-    user_doc = await db.users.find_one(
-        {"user_id": session_doc["user_id"]},
-        {"_id": 0}
+# ============== Lifespan (M1: replaces deprecated on_event) ==============
+
+async def _ensure_indexes() -> None:
+    """Ensure MongoDB indexes exist for performance and session TTL cleanup."""
+    # Index builds are independent; issue them concurrently
+    results = await asyncio.gather(
+        db.user_sessions.create_index("session_token", unique=True),
+        db.user_sessions.create_index("expires_at", expireAfterSeconds=0),
+        db.user_sessions.create_index([("session_token", 1), ("expires_at", 1)]),
+        db.users.create_index("user_id", unique=True),
+        db.users.create_index("email", unique=True),
+        db.status_checks.create_index([("timestamp", -1), ("_id", -1)]),
+        return_exceptions=True
     )
-    if not user_doc:
+    errors = [r for r in results if isinstance(r, Exception)]
+    if errors:
+        for e in errors:
+            logger.warning(f"Could not create MongoDB index: {e}")
+    else:
+        logger.info("MongoDB indexes ensured")
+
+
+async def _migrate_session_expiry() -> None:
+    """Convert legacy string expires_at values to BSON dates.
+
+    Session lookups compare expires_at against a datetime and the TTL index
+    only expires date values, so string rows would never match or be reaped.
+    """
+    try:
+        result = await db.user_sessions.update_many(
+            {"expires_at": {"$type": "string"}},
+            [{"$set": {"expires_at": {"$toDate": "$expires_at"}}}]
+        )
+        if result.modified_count:
+            logger.info(f"Migrated {result.modified_count} session(s) to date expires_at")
+    except Exception as e:
+        logger.warning(f"Could not migrate session expiry values: {e}")
+
+
+async def _migrate_status_check_timestamps() -> None:
+    """Convert legacy BSON date timestamps on status checks to UTC ISO strings.
+
+    New rows store isoformat() strings, and GET /status sorts and seeks on
+    them; BSON dates sort apart from strings, so date rows would be misplaced
+    and never match a keyset cursor.
+    """
+    try:
+        result = await db.status_checks.update_many(
+            {"timestamp": {"$type": "date"}},
+            [{"$set": {"timestamp": {"$dateToString": {
+                "date": "$timestamp", "format": "%Y-%m-%dT%H:%M:%S.%L000+00:00"
+            }}}}]
+        )
+        if result.modified_count:
+            logger.info(f"Migrated {result.modified_count} status check(s) to string timestamps")
+    except Exception as e:
+        logger.warning(f"Could not migrate status check timestamps: {e}")
+
+
+async def _load_gateway_config_doc() -> Optional[dict]:
+    """Read the persistent gateway config from the database."""
+    try:
+        return await db.moltbot_configs.find_one({"_id": "gateway_config"})
+    except Exception as e:
+        logger.warning(f"Could not read gateway config from database: {e}")
         return None
 
-    return User(**user_doc)
 
+async def _reload_supervisor_and_get_state() -> tuple[bool, Optional[int]]:
+    """Reload supervisor config to pick up any changes, then get (running, pid)."""
+    await _sv(SupervisorClient.reload_config)
+    return await _sv(SupervisorClient.get_state)
 
-# ============== Lifespan (M1: replaces deprecated on_event) ==============
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan: startup and shutdown logic."""
-    global _http_client
+    global _http_client, _gateway_client, _SV_POOL
     # --- STARTUP ---
     logger.info("Server starting up...")
 
-    # Create shared httpx client (H5)
-    _http_client = httpx.AsyncClient(timeout=30.0)
+    _SV_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="sv")
 
-    # Ensure MongoDB indexes exist for performance and session TTL cleanup
-    try:
-        await db.user_sessions.create_index("session_token", unique=True)
-        await db.user_sessions.create_index("expires_at", expireAfterSeconds=0)
-        await db.users.create_index("user_id", unique=True)
-        await db.users.create_index("email", unique=True)
-        logger.info("MongoDB indexes ensured")
-    except Exception as e:
-        logger.warning(f"Could not create MongoDB indexes: {e}")
+    # Create shared httpx clients (H5)
+    _http_client = _new_http_client()
+    _gateway_client = _new_gateway_client()
 
-    # Reload supervisor config to pick up any changes
-    await asyncio.to_thread(SupervisorClient.reload_config)
+    # Independent startup probes (indexes, session migration, persisted config,
+    # supervisor state) run concurrently instead of serializing their round-trips
+    _, _, _, config_doc, (is_running, pid) = await asyncio.gather(
+        _ensure_indexes(),
+        _migrate_session_expiry(),
+        _migrate_status_check_timestamps(),
+        _load_gateway_config_doc(),
+        _reload_supervisor_and_get_state(),
+    )
 
     # Check and install Moltbot dependencies if needed
     clawdbot_cmd = get_clawdbot_command()
@@ -381,28 +593,19 @@ async def lifespan(app: FastAPI):
     else:
         logger.info("Moltbot dependencies not found, will install on first use")
 
-    # Check database for persistent gateway config
-    config_doc = None
-    try:
-        config_doc = await db.moltbot_configs.find_one({"_id": "gateway_config"})
-    except Exception as e:
-        logger.warning(f"Could not read gateway config from database: {e}")
-
     should_run = config_doc.get("should_run", False) if config_doc else False
     logger.info(f"Gateway should_run flag: {should_run}")
 
     # Check if gateway is already running via supervisor
-    is_running = await asyncio.to_thread(SupervisorClient.status)
     if is_running:
-        pid = await asyncio.to_thread(SupervisorClient.get_pid)
         logger.info(f"Gateway already running via supervisor (PID: {pid})")
 
         gateway_state["provider"] = config_doc.get("provider", "emergent") if config_doc else "emergent"
 
         # Recover token from config file (not from DB — DB only stores hash)
         try:
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
+            with open(CONFIG_FILE, 'rb') as f:
+                config = orjson.loads(f.read())
             gateway_state["token"] = config.get("gateway", {}).get("auth", {}).get("token")
             logger.info("Recovered gateway token from config file")
         except Exception as e:
@@ -419,10 +622,10 @@ async def lifespan(app: FastAPI):
         # Recover token from config file
         token = None
         try:
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
+            with open(CONFIG_FILE, 'rb') as f:
+                config = orjson.loads(f.read())
             token = config.get("gateway", {}).get("auth", {}).get("token")
-        except (OSError, json.JSONDecodeError, ValueError, AttributeError):
+        except (OSError, orjson.JSONDecodeError, ValueError, AttributeError):
             token = generate_token()
 
         if not token:
@@ -440,16 +643,14 @@ async def lifespan(app: FastAPI):
                 "Gateway auto-start skipped for provider '%s': API key not persisted. "
                 "User must re-start from the setup page.", auto_provider
             )
-            await db.moltbot_configs.update_one(
-                {"_id": "gateway_config"},
-                {"$set": {"should_run": False, "updated_at": datetime.now(timezone.utc)}}
-            )
+            await _mark_gateway_stopped()
             # Fall through without starting
 
         if auto_api_key or auto_provider == "emergent":
             write_gateway_env(token=token, api_key=auto_api_key, provider=auto_provider)
 
-            started = await asyncio.to_thread(SupervisorClient.start)
+            started = await _sv(SupervisorClient.start)
+            _invalidate_gateway_status()
             if started:
                 logger.info("Gateway auto-started successfully via supervisor")
                 await asyncio.sleep(3)
@@ -474,16 +675,21 @@ async def lifespan(app: FastAPI):
     except asyncio.CancelledError:
         pass
 
-    # Close shared httpx client
-    if _http_client and not _http_client.is_closed:
-        await _http_client.aclose()
+    # Close shared httpx clients
+    for client in (_http_client, _gateway_client):
+        if client and not client.is_closed:
+            await client.aclose()
+
+    # Don't block shutdown on a supervisorctl call that is still in flight
+    _SV_POOL.shutdown(wait=False)
+    _SV_POOL = None
 
     logger.info("Backend shutting down - gateway will continue running via supervisor")
     mongo_client.close()
 
 
 # Create the main app with lifespan
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -498,9 +704,7 @@ async def get_instance_status():
     Public endpoint - only returns locked status, no owner details.
     """
     owner = await get_instance_owner()
-    if owner:
-        return {"locked": True}
-    return {"locked": False}
+    return ORJSONResponse({"locked": owner is not None})
 
 
 @api_router.post("/auth/session")
@@ -511,7 +715,7 @@ async def create_session(request: SessionRequest, req: Request, response: Respon
     Blocks non-owners if instance is locked.
     """
     # H3: Rate limiting
-    client_ip = req.headers.get("x-real-ip") or req.client.host if req.client else "unknown"
+    client_ip = _get_client_ip(req)
     if not auth_rate_limiter.is_allowed(client_ip):
         raise HTTPException(status_code=429, detail="Too many requests. Please try again later.")
 
@@ -528,7 +732,7 @@ async def create_session(request: SessionRequest, req: Request, response: Respon
             logger.error(f"Emergent Auth error: {auth_response.status_code}")
             raise HTTPException(status_code=401, detail="Invalid session_id")
 
-        auth_data = auth_response.json()
+        auth_data = orjson.loads(auth_response.content)
         email = auth_data.get("email")
         name = auth_data.get("name", email.split("@")[0] if email else "User")
         picture = auth_data.get("picture")
@@ -536,27 +740,32 @@ async def create_session(request: SessionRequest, req: Request, response: Respon
         if not email:
             raise HTTPException(status_code=400, detail="No email in auth response")
 
-        # H1: Use upsert to atomically create or find user (avoids race condition)
+        now = datetime.now(timezone.utc)
+
+        # H1: Use upsert to atomically create or find user (avoids race condition).
+        # find_one_and_update returns the actual user (newly created or existing);
+        # the independent instance owner read is overlapped with it.
         user_id = f"user_{uuid.uuid4().hex[:12]}"
-        result = await db.users.update_one(
-            {"email": email},
-            {
-                "$setOnInsert": {
-                    "user_id": user_id,
-                    "email": email,
-                    "created_at": datetime.now(timezone.utc)
+        user_doc, owner = await asyncio.gather(
+            db.users.find_one_and_update(
+                {"email": email},
+                {
+                    "$setOnInsert": {
+                        "user_id": user_id,
+                        "email": email,
+                        "created_at": now
+                    },
+                    "$set": {"name": name, "picture": picture}
                 },
-                "$set": {"name": name, "picture": picture}
-            },
-            upsert=True
+                projection={"_id": 0},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            ),
+            get_instance_owner()
         )
-
-        # Fetch the actual user (whether newly created or existing)
-        user_doc = await db.users.find_one({"email": email}, {"_id": 0})
         user_id = user_doc["user_id"]
 
         # Check if instance is locked to another user
-        owner = await get_instance_owner()
         if owner and owner.get("user_id") != user_id:
             if owner.get("email") != email:
                 logger.warning(f"Blocked login attempt from {_mask_email(email)} - instance locked")
@@ -565,20 +774,22 @@ async def create_session(request: SessionRequest, req: Request, response: Respon
                     detail="This instance is private and locked to the owner. Access denied."
                 )
 
-        # H4: Invalidate old sessions for this user before creating new one
-        await db.user_sessions.delete_many({"user_id": user_id})
-
         # Create session (store hashed token in DB, raw token goes in cookie)
-        session_token = secrets.token_hex(32)
+        session_token = secrets.token_urlsafe(32)
         session_token_hash = _hash_token(session_token)
-        expires_at = datetime.now(timezone.utc) + timedelta(days=SESSION_EXPIRY_DAYS)
-
-        await db.user_sessions.insert_one({
-            "user_id": user_id,
-            "session_token": session_token_hash,
-            "expires_at": expires_at,
-            "created_at": datetime.now(timezone.utc)
-        })
+        expires_at = now + timedelta(days=SESSION_EXPIRY_DAYS)
+
+        # H4: Invalidate old sessions for this user and create the new one in one batch
+        await db.user_sessions.bulk_write([
+            DeleteMany({"user_id": user_id}),
+            InsertOne({
+                "user_id": user_id,
+                "session_token": session_token_hash,
+                "expires_at": expires_at,
+                "created_at": now
+            })
+        ], ordered=True)
+        _invalidate_user_sessions(user_id)
 
         # Set cookie
         response.set_cookie(
@@ -606,10 +817,13 @@ async def create_session(request: SessionRequest, req: Request, response: Respon
 @api_router.get("/auth/me")
 async def get_me(request: Request):
     """Get current authenticated user"""
-    user = await get_current_user(request)
-    if not user:
+    # Return the cached serialized user instead of re-dumping the model per request;
+    # returning the response directly also skips FastAPI's jsonable_encoder pass
+    session_token = _get_request_session_token(request)
+    resolved = await _resolve_session(session_token) if session_token else None
+    if not resolved:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    return user.model_dump()
+    return ORJSONResponse(resolved[1])
 
 
 @api_router.post("/auth/logout")
@@ -618,7 +832,9 @@ async def logout(request: Request, response: Response):
     session_token = request.cookies.get("session_token")
 
     if session_token:
-        await db.user_sessions.delete_one({"session_token": _hash_token(session_token)})
+        token_hash = _hash_token(session_token)
+        _session_cache.pop(token_hash, None)
+        await db.user_sessions.delete_one({"session_token": token_hash})
 
     response.delete_cookie(
         key="session_token",
@@ -639,8 +855,12 @@ CLAWDBOT_DIR = os.environ.get("CLAWDBOT_BIN_DIR") or os.path.join(_home, ".clawd
 CLAWDBOT_WRAPPER = os.environ.get("CLAWDBOT_WRAPPER") or os.path.join(_home, "run_clawdbot.sh")
 
 
-def get_clawdbot_command():
-    """Get the path to clawdbot executable"""
+# Resolved clawdbot path; only successful lookups are cached so a later
+# install is still picked up
+_clawdbot_cmd: Optional[str] = None
+
+
+def _find_clawdbot_command():
     if os.path.exists(CLAWDBOT_WRAPPER):
         return CLAWDBOT_WRAPPER
     if os.path.exists(f"{CLAWDBOT_DIR}/clawdbot"):
@@ -653,6 +873,20 @@ def get_clawdbot_command():
     return None
 
 
+def get_clawdbot_command():
+    """Get the path to clawdbot executable"""
+    global _clawdbot_cmd
+    if _clawdbot_cmd is None:
+        _clawdbot_cmd = _find_clawdbot_command()
+    return _clawdbot_cmd
+
+
+def reset_clawdbot_command_cache():
+    """Forget the cached clawdbot path (e.g. after running the installer)."""
+    global _clawdbot_cmd
+    _clawdbot_cmd = None
+
+
 def ensure_moltbot_installed():
     """Ensure Moltbot dependencies are installed"""
     # M5: Use relative path from ROOT_DIR instead of hardcoded /app/backend/
@@ -674,6 +908,7 @@ def ensure_moltbot_installed():
             )
             if result.returncode == 0:
                 logger.info("Moltbot dependencies installed successfully")
+                reset_clawdbot_command_cache()
                 return True
             else:
                 logger.error(f"Installation failed: {result.stderr}")
@@ -686,9 +921,132 @@ def ensure_moltbot_installed():
     return False
 
 
+# Static provider blocks for clawdbot.json, built once at import.
+# create_moltbot_config references these directly (only the Emergent blocks
+# get a per-call baseUrl via a shallow copy), so they must never be mutated.
+# C5: API keys are env var references, never plaintext.
+_ENV_API_KEY_REF = "${PROVIDER_API_KEY}"
+
+_EMERGENT_GPT_TEMPLATE = {
+    "apiKey": _ENV_API_KEY_REF,
+    "api": "openai-completions",
+    "models": [
+        {
+            "id": "gpt-5.2",
+            "name": "GPT-5.2",
+            "reasoning": True,
+            "input": ["text"],
+            "cost": {
+                "input": 0.00000175,
+                "output": 0.000014,
+                "cacheRead": 0.000000175,
+                "cacheWrite": 0.00000175
+            },
+            "contextWindow": 400000,
+            "maxTokens": 128000
+        }
+    ]
+}
+
+_EMERGENT_CLAUDE_TEMPLATE = {
+    "apiKey": _ENV_API_KEY_REF,
+    "api": "anthropic-messages",
+    "authHeader": True,
+    "models": [
+        {
+            "id": "claude-sonnet-4-5",
+            "name": "Claude Sonnet 4.5",
+            "input": ["text"],
+            "cost": {"input": 0.000003, "output": 0.000015, "cacheRead": 0.0000003, "cacheWrite": 0.00000375},
+            "contextWindow": 200000,
+            "maxTokens": 64000
+        },
+        {
+            "id": "claude-opus-4-5",
+            "name": "Claude Opus 4.5",
+            "input": ["text"],
+            "cost": {"input": 0.000005, "output": 0.000025, "cacheRead": 0.0000005, "cacheWrite": 0.00000625},
+            "contextWindow": 200000,
+            "maxTokens": 64000
+        }
+    ]
+}
+
+_OPENAI_TEMPLATE = {
+    "baseUrl": "https://api.openai.com/v1/",
+    "apiKey": _ENV_API_KEY_REF,
+    "api": "openai-completions",
+    "models": [
+        {
+            "id": "gpt-5.2",
+            "name": "GPT-5.2",
+            "reasoning": True,
+            "input": ["text", "image"],
+            "cost": {
+                "input": 0.00000175,
+                "output": 0.000014,
+                "cacheRead": 0.000000175,
+                "cacheWrite": 0.00000175
+            },
+            "contextWindow": 400000,
+            "maxTokens": 128000
+        },
+        {
+            "id": "o4-mini-2025-04-16",
+            "name": "o4-mini",
+            "reasoning": True,
+            "input": ["text", "image"],
+            "cost": {
+                "input": 0.0000011,
+                "output": 0.0000044
+            },
+            "contextWindow": 200000,
+            "maxTokens": 100000
+        },
+        {
+            "id": "gpt-4o",
+            "name": "GPT-4o",
+            "reasoning": False,
+            "input": ["text", "image"],
+            "cost": {
+                "input": 0.0000025,
+                "output": 0.00001
+            },
+            "contextWindow": 128000,
+            "maxTokens": 16384
+        }
+    ]
+}
+
+_ANTHROPIC_TEMPLATE = {
+    "baseUrl": "https://api.anthropic.com",
+    "apiKey": _ENV_API_KEY_REF,
+    "api": "anthropic-messages",
+    "models": [
+        {
+            "id": "claude-opus-4-5-20251101",
+            "name": "Claude Opus 4.5",
+            "input": ["text", "image"],
+            "cost": {"input": 0.000015, "output": 0.000075, "cacheRead": 0.0000015, "cacheWrite": 0.00001875},
+            "contextWindow": 200000,
+            "maxTokens": 64000
+        }
+    ]
+}
+
+
 def generate_token():
     """Generate a random gateway token"""
-    return secrets.token_hex(32)
+    return secrets.token_urlsafe(32)
+
+
+def _atomic_write_json(path: str, obj: dict) -> None:
+    """Serialize obj and atomically replace path with it (mode 0600).
+
+    A crash mid-write leaves the previous file intact instead of a truncated
+    config that would force a token regeneration on the next startup.
+    """
+    atomic_write(path, orjson.dumps(obj, option=orjson.OPT_INDENT_2))
 
 
 def create_moltbot_config(token: str = None, api_key: str = None, provider: str = "emergent", force_new_token: bool = False, model: str = None):
@@ -703,9 +1061,9 @@ def create_moltbot_config(token: str = None, api_key: str = None, provider: str
     existing_config = {}
     if os.path.exists(CONFIG_FILE):
         try:
-            with open(CONFIG_FILE, "r") as f:
-                existing_config = json.load(f)
-        except (OSError, json.JSONDecodeError, ValueError):
+            with open(CONFIG_FILE, "rb") as f:
+                existing_config = orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError, ValueError):
             pass
 
     existing_token = None
@@ -747,63 +1105,17 @@ def create_moltbot_config(token: str = None, api_key: str = None, provider: str
         existing_config["agents"]["defaults"] = {}
     existing_config["agents"]["defaults"]["workspace"] = WORKSPACE_DIR
 
-    # C5: Use env var references for API keys in JSON config (not plaintext)
-    _env_api_key_ref = "${PROVIDER_API_KEY}"
-
     if provider == "emergent":
         emergent_base_url = os.environ.get('EMERGENT_BASE_URL', 'https://integrations.emergentagent.com/llm')
 
         # C5: Use env var reference for Emergent too (key is in gateway.env)
-        emergent_gpt_provider = {
-            "baseUrl": f"{emergent_base_url}/",
-            "apiKey": _env_api_key_ref,
-            "api": "openai-completions",
-            "models": [
-                {
-                    "id": "gpt-5.2",
-                    "name": "GPT-5.2",
-                    "reasoning": True,
-                    "input": ["text"],
-                    "cost": {
-                        "input": 0.00000175,
-                        "output": 0.000014,
-                        "cacheRead": 0.000000175,
-                        "cacheWrite": 0.00000175
-                    },
-                    "contextWindow": 400000,
-                    "maxTokens": 128000
-                }
-            ]
+        existing_config["models"]["providers"]["emergent-gpt"] = {
+            "baseUrl": f"{emergent_base_url}/", **_EMERGENT_GPT_TEMPLATE
         }
-
-        emergent_claude_provider = {
-            "baseUrl": emergent_base_url,
-            "apiKey": _env_api_key_ref,
-            "api": "anthropic-messages",
-            "authHeader": True,
-            "models": [
-                {
-                    "id": "claude-sonnet-4-5",
-                    "name": "Claude Sonnet 4.5",
-                    "input": ["text"],
-                    "cost": {"input": 0.000003, "output": 0.000015, "cacheRead": 0.0000003, "cacheWrite": 0.00000375},
-                    "contextWindow": 200000,
-                    "maxTokens": 64000
-                },
-                {
-                    "id": "claude-opus-4-5",
-                    "name": "Claude Opus 4.5",
-                    "input": ["text"],
-                    "cost": {"input": 0.000005, "output": 0.000025, "cacheRead": 0.0000005, "cacheWrite": 0.00000625},
-                    "contextWindow": 200000,
-                    "maxTokens": 64000
-                }
-            ]
+        existing_config["models"]["providers"]["emergent-claude"] = {
+            "baseUrl": emergent_base_url, **_EMERGENT_CLAUDE_TEMPLATE
         }
 
-        existing_config["models"]["providers"]["emergent-gpt"] = emergent_gpt_provider
-        existing_config["models"]["providers"]["emergent-claude"] = emergent_claude_provider
-
         existing_config["agents"]["defaults"]["models"] = {
             "emergent-gpt/gpt-5.2": {"alias": "gpt-5.2"},
             "emergent-claude/claude-sonnet-4-5": {"alias": "sonnet"}
@@ -814,53 +1126,7 @@ def create_moltbot_config(token: str = None, api_key: str = None, provider: str
 
     elif provider == "openai":
         # C5: Don't store API key in JSON — use env var reference
-        openai_provider = {
-            "baseUrl": "https://api.openai.com/v1/",
-            "apiKey": _env_api_key_ref,
-            "api": "openai-completions",
-            "models": [
-                {
-                    "id": "gpt-5.2",
-                    "name": "GPT-5.2",
-                    "reasoning": True,
-                    "input": ["text", "image"],
-                    "cost": {
-                        "input": 0.00000175,
-                        "output": 0.000014,
-                        "cacheRead": 0.000000175,
-                        "cacheWrite": 0.00000175
-                    },
-                    "contextWindow": 400000,
-                    "maxTokens": 128000
-                },
-                {
-                    "id": "o4-mini-2025-04-16",
-                    "name": "o4-mini",
-                    "reasoning": True,
-                    "input": ["text", "image"],
-                    "cost": {
-                        "input": 0.0000011,
-                        "output": 0.0000044
-                    },
-                    "contextWindow": 200000,
-                    "maxTokens": 100000
-                },
-                {
-                    "id": "gpt-4o",
-                    "name": "GPT-4o",
-                    "reasoning": False,
-                    "input": ["text", "image"],
-                    "cost": {
-                        "input": 0.0000025,
-                        "output": 0.00001
-                    },
-                    "contextWindow": 128000,
-                    "maxTokens": 16384
-                }
-            ]
-        }
-
-        existing_config["models"]["providers"]["openai"] = openai_provider
+        existing_config["models"]["providers"]["openai"] = _OPENAI_TEMPLATE
         existing_config["agents"]["defaults"]["models"] = {
             "openai/gpt-5.2": {"alias": "gpt-5.2"}
         }
@@ -869,23 +1135,7 @@ def create_moltbot_config(token: str = None, api_key: str = None, provider: str
         }
 
     elif provider == "anthropic":
-        anthropic_provider = {
-            "baseUrl": "https://api.anthropic.com",
-            "apiKey": _env_api_key_ref,
-            "api": "anthropic-messages",
-            "models": [
-                {
-                    "id": "claude-opus-4-5-20251101",
-                    "name": "Claude Opus 4.5",
-                    "input": ["text", "image"],
-                    "cost": {"input": 0.000015, "output": 0.000075, "cacheRead": 0.0000015, "cacheWrite": 0.00001875},
-                    "contextWindow": 200000,
-                    "maxTokens": 64000
-                }
-            ]
-        }
-
-        existing_config["models"]["providers"]["anthropic"] = anthropic_provider
+        existing_config["models"]["providers"]["anthropic"] = _ANTHROPIC_TEMPLATE
         existing_config["agents"]["defaults"]["models"] = {
             "anthropic/claude-opus-4-5-20251101": {"alias": "opus"}
         }
@@ -904,7 +1154,7 @@ def create_moltbot_config(token: str = None, api_key: str = None, provider: str
 
         openrouter_provider = {
             "baseUrl": "https://openrouter.ai/api/v1/",
-            "apiKey": _env_api_key_ref,
+            "apiKey": _ENV_API_KEY_REF,
             "api": "openai-completions",
             "models": [
                 {
@@ -926,15 +1176,38 @@ def create_moltbot_config(token: str = None, api_key: str = None, provider: str
             "primary": model_slug
         }
 
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(existing_config, f, indent=2)
-
-    os.chmod(CONFIG_FILE, 0o600)
+    _atomic_write_json(CONFIG_FILE, existing_config)
 
     logger.info(f"Updated Moltbot config at {CONFIG_FILE} for provider: {provider}")
     return final_token
 
 
+async def _persist_gateway_config(token_hash: str, provider: str, owner_user_id: str, started_at: str):
+    """Record the running gateway in the database (C3: only the token hash is stored)."""
+    await db.moltbot_configs.update_one(
+        {"_id": "gateway_config"},
+        {
+            "$set": {
+                "should_run": True,
+                "owner_user_id": owner_user_id,
+                "provider": provider,
+                "token_hash": token_hash,
+                "started_at": started_at,
+                "updated_at": datetime.now(timezone.utc)
+            }
+        },
+        upsert=True
+    )
+
+
+async def _mark_gateway_stopped():
+    """Clear should_run so the gateway is not auto-started on the next backend start."""
+    await db.moltbot_configs.update_one(
+        {"_id": "gateway_config"},
+        {"$set": {"should_run": False, "updated_at": datetime.now(timezone.utc)}}
+    )
+
+
 async def start_gateway_process(api_key: str, provider: str, owner_user_id: str, model: str = None):
     """Start the Moltbot gateway process via supervisor (persistent, survives backend restarts)"""
     global gateway_state
@@ -945,19 +1218,23 @@ async def start_gateway_process(api_key: str, provider: str, owner_user_id: str,
         effective_api_key = os.environ.get('EMERGENT_API_KEY')
 
     # Check if already running via supervisor (M7: run blocking call in thread)
-    is_running = await asyncio.to_thread(SupervisorClient.status)
+    is_running = await _sv(SupervisorClient.status)
     if is_running:
         logger.info("Gateway already running via supervisor, applying new config and restarting...")
 
         token = create_moltbot_config(api_key=effective_api_key, provider=provider, force_new_token=True, model=model)
+        token_hash = _hash_token(token)
         write_gateway_env(token=token, api_key=effective_api_key, provider=provider)
 
-        restarted = await asyncio.to_thread(SupervisorClient.restart)
+        restarted = await _sv(SupervisorClient.restart)
+        _invalidate_gateway_status()
         if not restarted:
             logger.warning("Failed to restart gateway via supervisor, trying stop+start...")
-            await asyncio.to_thread(SupervisorClient.stop)
+            await _sv(SupervisorClient.stop)
+            _invalidate_gateway_status()
             await asyncio.sleep(2)
-            started = await asyncio.to_thread(SupervisorClient.start)
+            started = await _sv(SupervisorClient.start)
+            _invalidate_gateway_status()
             if not started:
                 raise HTTPException(status_code=500, detail="Failed to restart gateway with new configuration")
 
@@ -967,20 +1244,7 @@ async def start_gateway_process(api_key: str, provider: str, owner_user_id: str,
         gateway_state["owner_user_id"] = owner_user_id
 
         # C3: Store hashed token in database
-        await db.moltbot_configs.update_one(
-            {"_id": "gateway_config"},
-            {
-                "$set": {
-                    "should_run": True,
-                    "owner_user_id": owner_user_id,
-                    "provider": provider,
-                    "token_hash": _hash_token(token),
-                    "started_at": gateway_state["started_at"],
-                    "updated_at": datetime.now(timezone.utc)
-                }
-            },
-            upsert=True
-        )
+        await _persist_gateway_config(token_hash, provider, owner_user_id, gateway_state["started_at"])
 
         return token
 
@@ -993,11 +1257,13 @@ async def start_gateway_process(api_key: str, provider: str, owner_user_id: str,
             raise HTTPException(status_code=500, detail="Failed to find clawdbot after installation")
 
     token = create_moltbot_config(api_key=effective_api_key, provider=provider, model=model)
+    token_hash = _hash_token(token)
     write_gateway_env(token=token, api_key=effective_api_key, provider=provider)
 
     logger.info(f"Starting Moltbot gateway via supervisor on port {MOLTBOT_PORT}...")
 
-    started = await asyncio.to_thread(SupervisorClient.start)
+    started = await _sv(SupervisorClient.start)
+    _invalidate_gateway_status()
     if not started:
         raise HTTPException(status_code=500, detail="Failed to start gateway via supervisor")
 
@@ -1006,12 +1272,14 @@ async def start_gateway_process(api_key: str, provider: str, owner_user_id: str,
     gateway_state["started_at"] = datetime.now(timezone.utc).isoformat()
     gateway_state["owner_user_id"] = owner_user_id
 
-    # Wait for gateway to be ready
+    # Wait for gateway to be ready, probing with exponential backoff so a fast
+    # start is detected within tens of milliseconds without hammering a slow one
     max_wait = 60
     loop = asyncio.get_running_loop()
     start_time = loop.time()
+    delay = 0.05
 
-    http_client = get_http_client()
+    http_client = get_gateway_client()
     while loop.time() - start_time < max_wait:
         try:
             resp = await http_client.get(f"http://127.0.0.1:{MOLTBOT_PORT}/", timeout=2.0)
@@ -1019,36 +1287,55 @@ async def start_gateway_process(api_key: str, provider: str, owner_user_id: str,
                 logger.info("Moltbot gateway is ready!")
 
                 # C3: Store hashed token in database
-                await db.moltbot_configs.update_one(
-                    {"_id": "gateway_config"},
-                    {
-                        "$set": {
-                            "should_run": True,
-                            "owner_user_id": owner_user_id,
-                            "provider": provider,
-                            "token_hash": _hash_token(token),
-                            "started_at": gateway_state["started_at"],
-                            "updated_at": datetime.now(timezone.utc)
-                        }
-                    },
-                    upsert=True
-                )
+                await _persist_gateway_config(token_hash, provider, owner_user_id, gateway_state["started_at"])
 
                 return token
         except Exception:
             pass
-        await asyncio.sleep(1)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 1.0)
 
-    sv_running = await asyncio.to_thread(SupervisorClient.status)
+    sv_running = await _sv(SupervisorClient.status)
     if not sv_running:
         raise HTTPException(status_code=500, detail="Gateway failed to start via supervisor")
 
     raise HTTPException(status_code=500, detail="Gateway did not become ready in time")
 
 
-async def check_gateway_running():
+# Supervisor status is cached briefly so polling endpoints and concurrent
+# callers share one supervisorctl call; start/stop/restart invalidate it.
+GATEWAY_STATUS_TTL = 0.5
+# "gen" is bumped on every invalidation, so a query that was already in flight
+# across a start/stop/restart cannot store its pre-transition result
+_gateway_status_cache = {"ts": float("-inf"), "value": (False, None), "gen": 0}
+_gateway_status_lock = asyncio.Lock()
+
+
+def _invalidate_gateway_status():
+    _gateway_status_cache["ts"] = float("-inf")
+    _gateway_status_cache["gen"] += 1
+
+
+async def get_gateway_state() -> tuple[bool, Optional[int]]:
+    """Get (running, pid) of the gateway via supervisor (M7: async)"""
+    loop = asyncio.get_running_loop()
+    if loop.time() - _gateway_status_cache["ts"] < GATEWAY_STATUS_TTL:
+        return _gateway_status_cache["value"]
+    async with _gateway_status_lock:
+        # Another caller may have refreshed the value while we waited
+        if loop.time() - _gateway_status_cache["ts"] < GATEWAY_STATUS_TTL:
+            return _gateway_status_cache["value"]
+        gen = _gateway_status_cache["gen"]
+        value = await _sv(SupervisorClient.get_state)
+        if _gateway_status_cache["gen"] == gen:
+            _gateway_status_cache["value"] = value
+            _gateway_status_cache["ts"] = loop.time()
+        return value
+
+
+async def check_gateway_running() -> bool:
     """Check if the gateway process is still running via supervisor (M7: async)"""
-    return await asyncio.to_thread(SupervisorClient.status)
+    return (await get_gateway_state())[0]
 
 
 # ============== Moltbot API Endpoints (Protected) ==============
@@ -1062,7 +1349,7 @@ async def root():
 async def start_moltbot(request: OpenClawStartRequest, req: Request):
     """Start the Moltbot gateway with chosen provider (requires auth)"""
     # H3: Rate limiting
-    client_ip = req.headers.get("x-real-ip") or req.client.host if req.client else "unknown"
+    client_ip = _get_client_ip(req)
     if not start_rate_limiter.is_allowed(client_ip):
         raise HTTPException(status_code=429, detail="Too many requests. Please try again later.")
 
@@ -1074,7 +1361,7 @@ async def start_moltbot(request: OpenClawStartRequest, req: Request):
 
     # Check if Moltbot is already running by another user
     running = await check_gateway_running()
-    if running and gateway_state["owner_user_id"] != user.user_id:
+    if running and not is_gateway_owner(user):
         raise HTTPException(
             status_code=403,
             detail="OpenClaw is already running by another user. Please wait for them to stop it."
@@ -1107,12 +1394,10 @@ async def start_moltbot(request: OpenClawStartRequest, req: Request):
 async def get_moltbot_status(request: Request):
     """Get the current status of the Moltbot gateway."""
     user = await get_current_user(request)
-    running = await check_gateway_running()
+    running, pid = await get_gateway_state()
 
     if running:
-        is_owner = bool(user and gateway_state["owner_user_id"] == user.user_id)
-        if is_owner:
-            pid = await asyncio.to_thread(SupervisorClient.get_pid)
+        if is_gateway_owner(user):
             return OpenClawStatusResponse(
                 running=True,
                 pid=pid,
@@ -1122,13 +1407,8 @@ async def get_moltbot_status(request: Request):
                 owner_user_id=gateway_state["owner_user_id"],
                 is_owner=True
             )
-        else:
-            return OpenClawStatusResponse(
-                running=True,
-                is_owner=False if user else None
-            )
-    else:
-        return OpenClawStatusResponse(running=False)
+        return _STATUS_RUNNING_NOT_OWNER if user else _STATUS_RUNNING_ANONYMOUS
+    return _STATUS_NOT_RUNNING
 
 
 @api_router.get("/openclaw/whatsapp/status")
@@ -1136,7 +1416,7 @@ async def get_whatsapp_connection_status(request: Request):
     """Get basic WhatsApp connection status. Requires authentication."""
     await require_auth(request)
     # M3: Run blocking I/O in thread
-    return await asyncio.to_thread(get_whatsapp_status)
+    return await _sv(get_whatsapp_status)
 
 
 @api_router.post("/openclaw/stop")
@@ -1148,26 +1428,20 @@ async def stop_moltbot(request: Request):
 
     running = await check_gateway_running()
     if not running:
-        await db.moltbot_configs.update_one(
-            {"_id": "gateway_config"},
-            {"$set": {"should_run": False, "updated_at": datetime.now(timezone.utc)}}
-        )
+        await _mark_gateway_stopped()
         return {"ok": True, "message": "OpenClaw is not running"}
 
-    if gateway_state["owner_user_id"] != user.user_id:
+    if not is_gateway_owner(user):
         raise HTTPException(status_code=403, detail="Only the owner can stop OpenClaw")
 
-    stopped = await asyncio.to_thread(SupervisorClient.stop)
+    # Clearing should_run does not depend on the stop outcome; overlap the two
+    stopped, _ = await asyncio.gather(_sv(SupervisorClient.stop), _mark_gateway_stopped())
+    _invalidate_gateway_status()
     if not stopped:
         logger.warning("Supervisor stop command returned failure, proceeding with cleanup anyway")
 
     clear_gateway_env()
 
-    await db.moltbot_configs.update_one(
-        {"_id": "gateway_config"},
-        {"$set": {"should_run": False, "updated_at": datetime.now(timezone.utc)}}
-    )
-
     gateway_state["token"] = None
     gateway_state["provider"] = None
     gateway_state["started_at"] = None
@@ -1185,7 +1459,7 @@ async def get_moltbot_token(request: Request):
     if not running:
         raise HTTPException(status_code=404, detail="OpenClaw not running")
 
-    if gateway_state["owner_user_id"] != user.user_id:
+    if not is_gateway_owner(user):
         raise HTTPException(status_code=403, detail="Only the owner can access the token")
 
     return {"token": gateway_state.get("token")}
@@ -1193,60 +1467,9 @@ async def get_moltbot_token(request: Request):
 
 # ============== Moltbot Proxy (Protected) ==============
 
-@api_router.api_route("/openclaw/ui/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "HEAD"])
-async def proxy_moltbot_ui(request: Request, path: str = ""):
-    """Proxy requests to the Moltbot Control UI (only owner can access)"""
-    user = await get_current_user(request)
-
-    running = await check_gateway_running()
-    if not running:
-        return HTMLResponse(
-            content="<html><body><h1>OpenClaw not running</h1><p>Please start OpenClaw first.</p><a href='/'>Go to setup</a></body></html>",
-            status_code=503
-        )
-
-    if not user or gateway_state["owner_user_id"] != user.user_id:
-        return HTMLResponse(
-            content="<html><body><h1>Access Denied</h1><p>This OpenClaw instance is owned by another user.</p><a href='/'>Go back</a></body></html>",
-            status_code=403
-        )
-
-    target_url = f"http://127.0.0.1:{MOLTBOT_PORT}/{path}"
-
-    if request.query_params:
-        target_url += f"?{request.query_params}"
-
-    # H5: Use shared httpx client
-    http_client = get_http_client()
-    try:
-        headers = dict(request.headers)
-        headers.pop("host", None)
-        headers.pop("content-length", None)
-        headers.pop("cookie", None)
-        headers.pop("authorization", None)
-
-        body = await request.body()
-
-        response = await http_client.request(
-            method=request.method,
-            url=target_url,
-            headers=headers,
-            content=body,
-            timeout=30.0
-        )
-
-        exclude_headers = {"content-encoding", "content-length", "transfer-encoding", "connection", "www-authenticate"}
-        response_headers = {
-            k: v for k, v in response.headers.items()
-            if k.lower() not in exclude_headers
-        }
-
-        content = response.content
-        content_type = response.headers.get("content-type", "")
-
-        if "text/html" in content_type:
-            content_str = content.decode('utf-8', errors='ignore')
-            ws_override = '''
+# Script injected into proxied Control UI HTML so its WebSocket connects through
+# /api/openclaw/ws. Pre-encoded once; the proxy splices it into the raw body.
+WS_OVERRIDE_BYTES = b'''
 <script>
 // OpenClaw Proxy Configuration
 window.__MOLTBOT_PROXY_WS_URL__ = (window.location.protocol === 'https:' ? 'wss:' : 'ws:') + '//' + window.location.host + '/api/openclaw/ws';
@@ -1288,13 +1511,95 @@ window.__MOLTBOT_PROXY_WS_URL__ = (window.location.protocol === 'https:' ? 'wss:
 })();
 </script>
 '''
-            if '</head>' in content_str:
-                content_str = content_str.replace('</head>', ws_override + '</head>')
-            elif '<body>' in content_str:
-                content_str = content_str.replace('<body>', '<body>' + ws_override)
-            else:
-                content_str = ws_override + content_str
-            content = content_str.encode('utf-8')
+
+HEAD_CLOSE = b'</head>'
+BODY_OPEN = b'<body>'
+
+# ASGI header names are lowercase bytes; httpx response header names are lowercase str
+_PROXY_STRIPPED_REQUEST_HEADERS = frozenset((b"host", b"content-length", b"cookie", b"authorization"))
+_PROXY_EXCLUDED_RESPONSE_HEADERS = frozenset((
+    "content-encoding", "content-length", "transfer-encoding", "connection", "www-authenticate"
+))
+
+
+@api_router.api_route("/openclaw/ui/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "HEAD"])
+async def proxy_moltbot_ui(request: Request, path: str = ""):
+    """Proxy requests to the Moltbot Control UI (only owner can access)"""
+    user = await get_current_user(request)
+
+    running = await check_gateway_running()
+    if not running:
+        return HTMLResponse(
+            content="<html><body><h1>OpenClaw not running</h1><p>Please start OpenClaw first.</p><a href='/'>Go to setup</a></body></html>",
+            status_code=503
+        )
+
+    if not is_gateway_owner(user):
+        return HTMLResponse(
+            content="<html><body><h1>Access Denied</h1><p>This OpenClaw instance is owned by another user.</p><a href='/'>Go back</a></body></html>",
+            status_code=403
+        )
+
+    target_url = f"http://127.0.0.1:{MOLTBOT_PORT}/{path}"
+
+    if request.query_params:
+        target_url += f"?{request.query_params}"
+
+    # H5: Use shared httpx client
+    http_client = get_gateway_client()
+    try:
+        # Forward raw ASGI headers in one pass, minus hop/credential headers
+        headers = [
+            (k, v) for k, v in request.scope["headers"]
+            if k not in _PROXY_STRIPPED_REQUEST_HEADERS
+        ]
+
+        body = await request.body()
+
+        upstream_request = http_client.build_request(
+            method=request.method,
+            url=target_url,
+            headers=headers,
+            content=body,
+            timeout=30.0
+        )
+        response = await http_client.send(upstream_request, stream=True)
+
+        # httpx already lowercases header names
+        response_headers = {
+            k: v for k, v in response.headers.items()
+            if k not in _PROXY_EXCLUDED_RESPONSE_HEADERS
+        }
+
+        content_type = response.headers.get("content-type", "")
+
+        # Only HTML needs rewriting; stream everything else through without
+        # buffering the body. aiter_bytes() yields decoded content, matching
+        # the dropped content-encoding header.
+        if "text/html" not in content_type:
+            return StreamingResponse(
+                response.aiter_bytes(),
+                status_code=response.status_code,
+                headers=response_headers,
+                media_type=content_type or None,
+                background=BackgroundTask(response.aclose)
+            )
+
+        try:
+            content = await response.aread()
+        finally:
+            await response.aclose()
+
+        # Inject the WebSocket override on raw bytes; no decode/encode round-trip
+        idx = content.find(HEAD_CLOSE)
+        if idx == -1:
+            idx = content.find(BODY_OPEN)
+            if idx != -1:
+                idx += len(BODY_OPEN)
+        if idx == -1:
+            content = WS_OVERRIDE_BYTES + content
+        else:
+            content = content[:idx] + WS_OVERRIDE_BYTES + content[idx:]
 
         return Response(
             content=content,
@@ -1303,7 +1608,7 @@ window.__MOLTBOT_PROXY_WS_URL__ = (window.location.protocol === 'https:' ? 'wss:
             media_type=response.headers.get("content-type")
         )
     except httpx.RequestError as e:
-        logger.error(f"Proxy error: {e}")
+        logger.error("Proxy error: %s", e)
         raise HTTPException(status_code=502, detail="Failed to connect to OpenClaw")
 
 
@@ -1329,7 +1634,7 @@ async def websocket_proxy(websocket: WebSocket):
         await websocket.close(code=4001, reason="Authentication required")
         return
 
-    if gateway_state.get("owner_user_id") != user.user_id:
+    if not is_gateway_owner(user):
         await websocket.accept()
         await websocket.close(code=4003, reason="Access denied: not the instance owner")
         return
@@ -1362,40 +1667,34 @@ async def websocket_proxy(websocket: WebSocket):
         ) as moltbot_ws:
 
             async def client_to_moltbot():
-                last_activity = time.monotonic()
                 try:
                     while True:
-                        try:
-                            # H9: Idle timeout check
-                            remaining = WS_IDLE_TIMEOUT - (time.monotonic() - last_activity)
-                            if remaining <= 0:
-                                logger.info("WebSocket idle timeout reached")
-                                break
-
-                            data = await asyncio.wait_for(
-                                websocket.receive(),
-                                timeout=min(remaining, 60)
-                            )
-                            last_activity = time.monotonic()
-
-                            if data["type"] == "websocket.receive":
-                                # H8: Check message size
-                                msg = data.get("text") or data.get("bytes", b"")
-                                if len(msg) > WS_MAX_MESSAGE_SIZE:
-                                    logger.warning("WebSocket message too large, dropping")
-                                    continue
-                                if "text" in data:
-                                    await moltbot_ws.send(data["text"])
-                                elif "bytes" in data:
-                                    await moltbot_ws.send(data["bytes"])
-                            elif data["type"] == "websocket.disconnect":
-                                break
-                        except asyncio.TimeoutError:
-                            continue
-                        except WebSocketDisconnect:
+                        # H9: Idle timeout; every received frame starts a new window.
+                        # asyncio.wait_for rather than asyncio.timeout, which needs 3.11+.
+                        data = await asyncio.wait_for(websocket.receive(), timeout=WS_IDLE_TIMEOUT)
+
+                        # Raw ASGI message: one dict per frame, mixed text/binary
+                        msg_type = data["type"]
+                        if msg_type == "websocket.disconnect":
                             break
+                        if msg_type == "websocket.receive":
+                            # Exactly one of text/bytes carries the payload
+                            msg = data.get("text")
+                            if msg is None:
+                                msg = data.get("bytes")
+                                if msg is None:
+                                    continue
+                            # H8: Check message size
+                            if len(msg) > WS_MAX_MESSAGE_SIZE:
+                                logger.warning("WebSocket message too large, dropping")
+                                continue
+                            await moltbot_ws.send(msg)
+                except asyncio.TimeoutError:
+                    logger.info("WebSocket idle timeout reached")
+                except WebSocketDisconnect:
+                    pass
                 except Exception as e:
-                    logger.error(f"Client to Moltbot error: {e}")
+                    logger.error("Client to Moltbot error: %s", e)
 
             async def moltbot_to_client():
                 try:
@@ -1406,9 +1705,9 @@ async def websocket_proxy(websocket: WebSocket):
                             else:
                                 await websocket.send_bytes(message)
                 except ConnectionClosed as e:
-                    logger.info(f"Moltbot WebSocket closed: {e}")
+                    logger.info("Moltbot WebSocket closed: %s", e)
                 except Exception as e:
-                    logger.error(f"Moltbot to client error: {e}")
+                    logger.error("Moltbot to client error: %s", e)
 
             done, pending = await asyncio.wait(
                 [
@@ -1424,7 +1723,7 @@ async def websocket_proxy(websocket: WebSocket):
             await asyncio.gather(*pending, return_exceptions=True)
 
     except Exception as e:
-        logger.error(f"WebSocket proxy error: {e}")
+        logger.error("WebSocket proxy error: %s", e)
     finally:
         try:
             if websocket.client_state == WebSocketState.CONNECTED:
@@ -1447,17 +1746,50 @@ async def create_status_check(input: StatusCheckCreate):
     return status_obj
 
 
-# M8: Add pagination
+def _encode_status_cursor(timestamp: str, oid: ObjectId) -> str:
+    """Opaque keyset cursor for GET /status: the (timestamp, _id) of a page's last row."""
+    return base64.urlsafe_b64encode(f"{timestamp}|{oid}".encode()).decode()
+
+
+def _decode_status_cursor(cursor: str) -> tuple[str, ObjectId]:
+    try:
+        timestamp, oid = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return timestamp, ObjectId(oid)
+    except (binascii.Error, UnicodeError, ValueError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+# M8: Add pagination. Results are newest first, ordered by (timestamp, _id) so
+# rows sharing a timestamp keep a stable order; this applies to offset= paging
+# as well, which used to return rows in insertion order. The X-Next-Before response
+# header carries an opaque cursor; pass it back as `before` to fetch the next
+# page with an index seek instead of a skip scan.
 @api_router.get("/status", response_model=List[StatusCheck])
 async def get_status_checks(
+    response: Response,
     limit: int = Query(default=50, ge=1, le=200),
-    offset: int = Query(default=0, ge=0)
+    offset: int = Query(default=0, ge=0),
+    before: Optional[str] = Query(default=None, max_length=512)
 ):
-    status_checks = await db.status_checks.find(
-        {}, {"_id": 0}
-    ).skip(offset).limit(limit).to_list(limit)
+    query = {}
+    if before is not None:
+        ts, oid = _decode_status_cursor(before)
+        query = {"$or": [
+            {"timestamp": {"$lt": ts}},
+            {"timestamp": ts, "_id": {"$lt": oid}},
+        ]}
+
+    cursor = db.status_checks.find(query).sort([("timestamp", -1), ("_id", -1)])
+    if offset:
+        cursor = cursor.skip(offset)
+    status_checks = await cursor.limit(limit).batch_size(limit).to_list(limit)
+
+    if len(status_checks) == limit:
+        last = status_checks[-1]
+        response.headers["X-Next-Before"] = _encode_status_cursor(last["timestamp"], last["_id"])
 
     for check in status_checks:
+        del check['_id']
         if isinstance(check['timestamp'], str):
             check['timestamp'] = datetime.fromisoformat(check['timestamp'])
 
@@ -1467,35 +1799,55 @@ async def get_status_checks(
 # Include the router in the main app
 app.include_router(api_router)
 
-# C2: CSRF protection middleware - validates Origin AND Referer headers
-@app.middleware("http")
-async def csrf_protection(request: Request, call_next):
-    if request.method in ("POST", "PUT", "DELETE", "PATCH"):
-        origin = request.headers.get("origin")
-        referer = request.headers.get("referer")
+# C2: CSRF protection middleware - validates Origin AND Referer headers.
+# Plain ASGI so safe methods pass straight through without building a Request.
+_CSRF_CHECKED_METHODS = frozenset(("POST", "PUT", "DELETE", "PATCH"))
+
+
+def _csrf_reject(detail: str) -> JSONResponse:
+    return JSONResponse(status_code=403, content={"detail": f"CSRF validation failed: {detail}"})
+
+
+class CSRFMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in _CSRF_CHECKED_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        response = self._check(scope)
+        if response is not None:
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def _check(scope) -> Optional[JSONResponse]:
+        """Return a 403 response if the request fails the CSRF check, else None."""
+        origin = referer = host = forwarded_proto = authorization = None
+        for key, value in scope["headers"]:
+            if key == b"origin":
+                origin = origin or value.decode("latin-1")
+            elif key == b"referer":
+                referer = referer or value.decode("latin-1")
+            elif key == b"host":
+                host = host or value.decode("latin-1")
+            elif key == b"x-forwarded-proto":
+                forwarded_proto = forwarded_proto or value.decode("latin-1")
+            elif key == b"authorization":
+                authorization = authorization or value.decode("latin-1")
 
         # Build expected same-origin from request headers
-        host = request.headers.get("host", "")
-        forwarded_proto = request.headers.get("x-forwarded-proto", request.url.scheme)
-        expected_origin = f"{forwarded_proto}://{host}"
-
-        # Collect allowed origins: same-origin + configured CORS origins
-        allowed = {expected_origin}
-        cors_env = os.environ.get('CORS_ORIGINS', '')
-        if cors_env and cors_env.strip() != '*':
-            for o in cors_env.split(','):
-                o = o.strip()
-                if o:
-                    allowed.add(o)
+        expected_origin = f"{forwarded_proto or scope['scheme']}://{host or ''}"
 
+        # Allowed origins: same-origin + configured CORS origins (parsed once at import)
         if origin:
             # Check Origin header
-            if origin not in allowed:
-                logger.warning(f"CSRF: blocked request from origin={origin}")
-                return JSONResponse(
-                    status_code=403,
-                    content={"detail": "CSRF validation failed: origin not allowed"}
-                )
+            if origin != expected_origin and origin not in _CSRF_ALLOWED_ORIGINS:
+                logger.warning("CSRF: blocked request from origin=%s", origin)
+                return _csrf_reject("origin not allowed")
         elif referer:
             # Fallback: check Referer header
             referer_origin = referer.split('/', 3)
@@ -1503,24 +1855,19 @@ async def csrf_protection(request: Request, call_next):
                 referer_origin = '/'.join(referer_origin[:3])
             else:
                 referer_origin = referer
-            if referer_origin not in allowed:
-                logger.warning(f"CSRF: blocked request with referer={referer_origin}")
-                return JSONResponse(
-                    status_code=403,
-                    content={"detail": "CSRF validation failed: referer not allowed"}
-                )
+            if referer_origin != expected_origin and referer_origin not in _CSRF_ALLOWED_ORIGINS:
+                logger.warning("CSRF: blocked request with referer=%s", referer_origin)
+                return _csrf_reject("referer not allowed")
         else:
             # C2: Neither Origin nor Referer present — block state-changing requests
             # Exception: allow requests that use Bearer token auth (API clients)
-            auth_header = request.headers.get("authorization", "")
-            if not auth_header.startswith("Bearer "):
+            if not (authorization or "").startswith("Bearer "):
                 logger.warning("CSRF: blocked request with no Origin or Referer header")
-                return JSONResponse(
-                    status_code=403,
-                    content={"detail": "CSRF validation failed: Origin or Referer header required"}
-                )
+                return _csrf_reject("Origin or Referer header required")
+        return None
+
 
-    return await call_next(request)
+app.add_middleware(CSRFMiddleware)
 
 
 # CORS configuration
@@ -1539,31 +1886,52 @@ elif _cors_origins_raw:
 else:
     _cors_origins = []
 
+# Explicitly configured origins accepted by the CSRF check besides same-origin
+_CSRF_ALLOWED_ORIGINS: frozenset[str] = frozenset(_cors_origins)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=_cors_allow_credentials,
     allow_origins=_cors_origins,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Before"],
 )
 
 
 # Background task for auto-fixing WhatsApp
+WHATSAPP_WATCH_MIN_INTERVAL = 5
+WHATSAPP_WATCH_MAX_INTERVAL = 60
+
+
 async def whatsapp_auto_fix_watcher():
-    """Auto-fix Baileys registered=false bug every 5 seconds."""
+    """Auto-fix Baileys registered=false bug.
+
+    Polls every 5 seconds after a detection or a change in link state, backing
+    off to once a minute while nothing changes. Iterations run sequentially,
+    so a slow check never overlaps the next one.
+    """
     logger.info("[whatsapp-watcher] Background watcher started")
+    interval = WHATSAPP_WATCH_MIN_INTERVAL
+    last_status = None
     while True:
-        await asyncio.sleep(5)
+        await asyncio.sleep(interval)
+        interval = min(interval * 2, WHATSAPP_WATCH_MAX_INTERVAL)
         try:
             # M3: Run blocking I/O in thread
-            status = await asyncio.to_thread(get_whatsapp_status)
+            status = await _sv(get_whatsapp_status)
+            if status != last_status:
+                interval = WHATSAPP_WATCH_MIN_INTERVAL
+                last_status = status
             if status["linked"] and not status["registered"]:
+                interval = WHATSAPP_WATCH_MIN_INTERVAL
                 logger.info("[whatsapp-watcher] DETECTED registered=false, applying fix...")
-                fixed = await asyncio.to_thread(fix_registered_flag)
+                fixed = await _sv(fix_registered_flag)
                 if fixed:
                     logger.info("[whatsapp-watcher] Fix applied, restarting gateway via supervisor...")
                     # M7: Run blocking subprocess in thread
-                    restarted = await asyncio.to_thread(SupervisorClient.restart)
+                    restarted = await _sv(SupervisorClient.restart)
+                    _invalidate_gateway_status()
                     if restarted:
                         logger.info("[whatsapp-watcher] Gateway restarted successfully")
                     else:
@@ -4,21 +4,39 @@ Supervisor client for managing the clawdbot gateway process.
 This module provides a clean interface for starting, stopping, and
 checking the status of the gateway process managed by supervisord.
 
-When the backend runs as a non-root user (e.g. CloudPanel site user),
-commands are prefixed with `sudo`. The deploy script configures sudoers
-to allow passwordless supervisorctl for the site user.
+When the backend can read and write supervisord's UNIX socket (normally only
+as root), calls go straight to supervisord's XML-RPC interface in-process.
+Otherwise, e.g. as a CloudPanel site user, they fall back to spawning
+`sudo supervisorctl`; the deploy script configures sudoers to allow
+passwordless supervisorctl for the site user, limited to the gateway.
 """
 
+import http.client
 import os
 import re
+import socket
 import subprocess
 import logging
+import xmlrpc.client
 
 logger = logging.getLogger(__name__)
 
+SUPERVISOR_SOCKET = os.environ.get("SUPERVISOR_SOCKET", "/var/run/supervisor.sock")
+_RPC_TIMEOUT = 30
+
+# supervisor.xmlrpc.Faults.ALREADY_STARTED / NOT_RUNNING / SUCCESS
+_FAULT_ALREADY_STARTED = 60
+_FAULT_NOT_RUNNING = 70
+_FAULT_SUCCESS = 80
+
+_PAST_TENSE = {'start': 'started', 'stop': 'stopped'}
+
 # Validate program name to prevent command injection via env var
 _SAFE_PROGRAM_RE = re.compile(r'^[a-zA-Z0-9_-]+$')
 
+# `supervisorctl status` line: "clawdbot-gateway            RUNNING   pid 12345, uptime 0:01:23"
+_STATUS_PID_RE = re.compile(rb'\bRUNNING\s+pid\s+(\d+)')
+
 
 def _validate_program_name(name: str) -> str:
     """Validate that a supervisor program name is safe."""
@@ -32,6 +50,10 @@ def _validate_program_name(name: str) -> str:
     return name
 
 
+# The service's effective uid does not change while it runs
+_IS_ROOT = os.geteuid() == 0
+
+
 def _build_cmd(args: list[str]) -> list[str]:
     """
     Build the supervisorctl command, prefixing with sudo if not root.
@@ -40,9 +62,52 @@ def _build_cmd(args: list[str]) -> list[str]:
     The deploy script creates /etc/sudoers.d/openclaw to allow passwordless
     supervisorctl for the site user.
     """
-    if os.geteuid() == 0:
+    if _IS_ROOT:
         return args
-    return ['sudo', '-n'] + args
+    return ['sudo', '-n', *args]
+
+
+_CMD_REREAD = _build_cmd(['supervisorctl', 'reread'])
+_CMD_UPDATE = _build_cmd(['supervisorctl', 'update'])
+
+
+def _decode(output: bytes) -> str:
+    """Decode supervisorctl output for logging; only error paths need text."""
+    return output.decode(errors='replace').strip()
+
+
+class _UnixStreamHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str):
+        super().__init__("localhost", timeout=_RPC_TIMEOUT)
+        self._socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._socket_path)
+
+
+class _UnixStreamTransport(xmlrpc.client.Transport):
+    def __init__(self, path: str):
+        super().__init__()
+        self._socket_path = path
+
+    def make_connection(self, host):
+        return _UnixStreamHTTPConnection(self._socket_path)
+
+
+def _get_rpc() -> xmlrpc.client.ServerProxy | None:
+    """
+    Return an XML-RPC proxy for supervisord, or None if the socket is not usable.
+
+    A fresh proxy is returned per call: ServerProxy reuses one connection and
+    is not safe to share between the threads that call into this module.
+    """
+    if not os.access(SUPERVISOR_SOCKET, os.R_OK | os.W_OK):
+        return None
+    return xmlrpc.client.ServerProxy(
+        "http://localhost", transport=_UnixStreamTransport(SUPERVISOR_SOCKET)
+    )
 
 
 class SupervisorClient:
@@ -52,6 +117,18 @@ class SupervisorClient:
         os.environ.get("SUPERVISOR_GATEWAY_PROGRAM", "clawdbot-gateway")
     )
 
+    # Supervisor group managed by start_all()/stop_all(). A [program:x] section
+    # without an explicit [group:...] forms a group of its own named x.
+    GROUP = _validate_program_name(
+        os.environ.get("SUPERVISOR_GROUP", PROGRAM)
+    )
+
+    # Built once; these lists are passed to subprocess.run and never mutated
+    _CMD_START = _build_cmd(['supervisorctl', 'start', PROGRAM])
+    _CMD_STOP = _build_cmd(['supervisorctl', 'stop', PROGRAM])
+    _CMD_STATUS = _build_cmd(['supervisorctl', 'status', PROGRAM])
+    _CMD_RESTART = _build_cmd(['supervisorctl', 'restart', PROGRAM])
+
     @classmethod
     def start(cls) -> bool:
         """
@@ -60,18 +137,32 @@ class SupervisorClient:
         Returns:
             True if the start command succeeded, False otherwise.
         """
+        rpc = _get_rpc()
+        if rpc is not None:
+            # Like `supervisorctl start`, an already running program is a success
+            try:
+                rpc.supervisor.startProcess(cls.PROGRAM)
+            except xmlrpc.client.Fault as e:
+                if e.faultCode != _FAULT_ALREADY_STARTED:
+                    logger.error("Failed to start %s: %s", cls.PROGRAM, e.faultString)
+                    return False
+            except Exception as e:
+                logger.error("Error starting %s: %s", cls.PROGRAM, e)
+                return False
+            logger.info("Started %s via supervisor", cls.PROGRAM)
+            return True
+
         try:
             result = subprocess.run(
-                _build_cmd(['supervisorctl', 'start', cls.PROGRAM]),
+                cls._CMD_START,
                 capture_output=True,
-                text=True,
                 timeout=30
             )
             if result.returncode == 0:
                 logger.info("Started %s via supervisor", cls.PROGRAM)
                 return True
             else:
-                logger.error("Failed to start %s: %s", cls.PROGRAM, result.stderr)
+                logger.error("Failed to start %s: %s", cls.PROGRAM, _decode(result.stderr))
                 return False
         except subprocess.TimeoutExpired:
             logger.error("Timeout starting %s", cls.PROGRAM)
@@ -88,18 +179,31 @@ class SupervisorClient:
         Returns:
             True if the stop command succeeded, False otherwise.
         """
+        rpc = _get_rpc()
+        if rpc is not None:
+            try:
+                rpc.supervisor.stopProcess(cls.PROGRAM)
+            except xmlrpc.client.Fault as e:
+                if e.faultCode != _FAULT_NOT_RUNNING:
+                    logger.error("Failed to stop %s: %s", cls.PROGRAM, e.faultString)
+                    return False
+            except Exception as e:
+                logger.error("Error stopping %s: %s", cls.PROGRAM, e)
+                return False
+            logger.info("Stopped %s via supervisor", cls.PROGRAM)
+            return True
+
         try:
             result = subprocess.run(
-                _build_cmd(['supervisorctl', 'stop', cls.PROGRAM]),
+                cls._CMD_STOP,
                 capture_output=True,
-                text=True,
                 timeout=30
             )
-            if result.returncode == 0 or 'NOT RUNNING' in result.stdout:
+            if result.returncode == 0 or b'NOT RUNNING' in result.stdout:
                 logger.info("Stopped %s via supervisor", cls.PROGRAM)
                 return True
             else:
-                logger.error("Failed to stop %s: %s", cls.PROGRAM, result.stderr)
+                logger.error("Failed to stop %s: %s", cls.PROGRAM, _decode(result.stderr))
                 return False
         except subprocess.TimeoutExpired:
             logger.error("Timeout stopping %s", cls.PROGRAM)
@@ -109,26 +213,50 @@ class SupervisorClient:
             return False
 
     @classmethod
-    def status(cls) -> bool:
+    def get_state(cls) -> tuple[bool, int | None]:
         """
-        Check if the gateway is running via supervisor.
+        Get whether the gateway is running and its PID from one status query.
+
+        Not cached here: server.py caches and coalesces status lookups and
+        invalidates them on start/stop/restart.
 
         Returns:
-            True if the process is running (RUNNING state), False otherwise.
+            (running, pid); pid is None unless running.
         """
+        rpc = _get_rpc()
+        if rpc is not None:
+            try:
+                info = rpc.supervisor.getProcessInfo(cls.PROGRAM)
+                if info['statename'] == 'RUNNING':
+                    return True, info['pid']
+                return False, None
+            except Exception as e:
+                logger.error("Error checking %s status: %s", cls.PROGRAM, e)
+                return False, None
+
         try:
             result = subprocess.run(
-                _build_cmd(['supervisorctl', 'status', cls.PROGRAM]),
+                cls._CMD_STATUS,
                 capture_output=True,
-                text=True,
                 timeout=10
             )
-            # Check for RUNNING state in output
-            # Output format: "clawdbot-gateway            RUNNING   pid 12345, uptime 0:01:23"
-            return 'RUNNING' in result.stdout
+            if b'RUNNING' not in result.stdout:
+                return False, None
+            m = _STATUS_PID_RE.search(result.stdout)
+            return True, int(m.group(1)) if m else None
         except Exception as e:
             logger.error("Error checking %s status: %s", cls.PROGRAM, e)
-            return False
+            return False, None
+
+    @classmethod
+    def status(cls) -> bool:
+        """
+        Check if the gateway is running via supervisor.
+
+        Returns:
+            True if the process is running (RUNNING state), False otherwise.
+        """
+        return cls.get_state()[0]
 
     @classmethod
     def get_pid(cls) -> int | None:
@@ -138,24 +266,7 @@ class SupervisorClient:
         Returns:
             The PID if running, None otherwise.
         """
-        try:
-            result = subprocess.run(
-                _build_cmd(['supervisorctl', 'status', cls.PROGRAM]),
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            # Parse PID from output like: "clawdbot-gateway            RUNNING   pid 12345, uptime 0:01:23"
-            if 'RUNNING' in result.stdout and 'pid' in result.stdout:
-                # Extract pid number
-                parts = result.stdout.split('pid')
-                if len(parts) > 1:
-                    pid_part = parts[1].strip().split(',')[0].strip()
-                    return int(pid_part)
-            return None
-        except Exception as e:
-            logger.error("Error getting %s PID: %s", cls.PROGRAM, e)
-            return None
+        return cls.get_state()[1]
 
     @classmethod
     def restart(cls) -> bool:
@@ -165,18 +276,33 @@ class SupervisorClient:
         Returns:
             True if the restart command succeeded, False otherwise.
         """
+        rpc = _get_rpc()
+        if rpc is not None:
+            # Same sequence as `supervisorctl restart`: stop if running, then start
+            try:
+                try:
+                    rpc.supervisor.stopProcess(cls.PROGRAM)
+                except xmlrpc.client.Fault as e:
+                    if e.faultCode != _FAULT_NOT_RUNNING:
+                        raise
+                rpc.supervisor.startProcess(cls.PROGRAM)
+                logger.info("Restarted %s via supervisor", cls.PROGRAM)
+                return True
+            except Exception as e:
+                logger.error("Error restarting %s: %s", cls.PROGRAM, e)
+                return False
+
         try:
             result = subprocess.run(
-                _build_cmd(['supervisorctl', 'restart', cls.PROGRAM]),
+                cls._CMD_RESTART,
                 capture_output=True,
-                text=True,
                 timeout=30
             )
             if result.returncode == 0:
                 logger.info("Restarted %s via supervisor", cls.PROGRAM)
                 return True
             else:
-                logger.error("Failed to restart %s: %s", cls.PROGRAM, result.stderr)
+                logger.error("Failed to restart %s: %s", cls.PROGRAM, _decode(result.stderr))
                 return False
         except subprocess.TimeoutExpired:
             logger.error("Timeout restarting %s", cls.PROGRAM)
@@ -185,6 +311,56 @@ class SupervisorClient:
             logger.error("Error restarting %s: %s", cls.PROGRAM, e)
             return False
 
+    @classmethod
+    def start_all(cls) -> bool:
+        """
+        Start every program in GROUP with a single supervisor call.
+
+        Needs access to the supervisor socket; there is no supervisorctl
+        fallback because sudoers only allows gateway-specific commands.
+
+        Returns:
+            True if all programs in the group started, False otherwise.
+        """
+        return cls._group_call('start')
+
+    @classmethod
+    def stop_all(cls) -> bool:
+        """
+        Stop every program in GROUP with a single supervisor call.
+
+        Needs access to the supervisor socket, like start_all().
+
+        Returns:
+            True if all programs in the group are stopped, False otherwise.
+        """
+        return cls._group_call('stop')
+
+    @classmethod
+    def _group_call(cls, action: str) -> bool:
+        """Run startProcessGroup/stopProcessGroup for GROUP over XML-RPC."""
+        rpc = _get_rpc()
+        if rpc is None:
+            logger.error(
+                "Cannot %s group %s: requires access to the supervisor socket %s",
+                action, cls.GROUP, SUPERVISOR_SOCKET,
+            )
+            return False
+        try:
+            method = getattr(rpc.supervisor, f'{action}ProcessGroup')
+            failed = [
+                r for r in method(cls.GROUP)
+                if r['status'] not in (_FAULT_SUCCESS, _FAULT_ALREADY_STARTED, _FAULT_NOT_RUNNING)
+            ]
+            if failed:
+                logger.error("Failed to %s group %s: %s", action, cls.GROUP, failed)
+                return False
+            logger.info("Group %s %s via supervisor", cls.GROUP, _PAST_TENSE[action])
+            return True
+        except Exception as e:
+            logger.error("Error in %s of group %s: %s", action, cls.GROUP, e)
+            return False
+
     @classmethod
     def reload_config(cls) -> bool:
         """
@@ -195,25 +371,33 @@ class SupervisorClient:
         Returns:
             True if reload succeeded, False otherwise.
         """
+        rpc = _get_rpc()
+        if rpc is not None:
+            try:
+                cls._reload_config_rpc(rpc)
+                logger.info("Supervisor configuration reloaded")
+                return True
+            except Exception as e:
+                logger.error("Error reloading supervisor config: %s", e)
+                return False
+
         try:
             result = subprocess.run(
-                _build_cmd(['supervisorctl', 'reread']),
+                _CMD_REREAD,
                 capture_output=True,
-                text=True,
                 timeout=10
             )
             if result.returncode != 0:
-                logger.error("Failed to reread supervisor config: %s", result.stderr)
+                logger.error("Failed to reread supervisor config: %s", _decode(result.stderr))
                 return False
 
             result = subprocess.run(
-                _build_cmd(['supervisorctl', 'update']),
+                _CMD_UPDATE,
                 capture_output=True,
-                text=True,
                 timeout=10
             )
             if result.returncode != 0:
-                logger.error("Failed to update supervisor: %s", result.stderr)
+                logger.error("Failed to update supervisor: %s", _decode(result.stderr))
                 return False
 
             logger.info("Supervisor configuration reloaded")
@@ -221,3 +405,13 @@ class SupervisorClient:
         except Exception as e:
             logger.error("Error reloading supervisor config: %s", e)
             return False
+
+    @staticmethod
+    def _reload_config_rpc(rpc: xmlrpc.client.ServerProxy) -> None:
+        """Equivalent of `supervisorctl reread` followed by `supervisorctl update`."""
+        [[added, changed, removed]] = rpc.supervisor.reloadConfig()
+        for group in removed + changed:
+            rpc.supervisor.stopProcessGroup(group)
+            rpc.supervisor.removeProcessGroup(group)
+        for group in changed + added:
+            rpc.supervisor.addProcessGroup(group)
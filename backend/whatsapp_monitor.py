@@ -1,45 +1,76 @@
 """WhatsApp Fix - Handles Baileys registered=false bug"""
 
 import fcntl
-import json
 import logging
+import mmap
+import os
+import re
 from pathlib import Path
 
+import orjson
+
+from gateway_config import atomic_write
+
 logger = logging.getLogger(__name__)
 
 CREDS_FILE = Path.home() / ".clawdbot/credentials/whatsapp/default/creds.json"
 
+_REGISTERED_FALSE_RE = re.compile(rb'"registered"\s*:\s*false')
 
-def _read_creds_locked() -> dict | None:
-    """Read credentials file with a shared (read) lock."""
-    if not CREDS_FILE.exists():
-        return None
+# ((st_ino, st_mtime_ns, st_size), status) of the last parsed creds.json
+_status_cache: tuple[tuple[int, int, int], dict] | None = None
+
+
+def _read_creds() -> dict | None:
+    """
+    Read the credentials file.
+
+    No lock is taken: the gateway never locks creds.json, and our own full
+    rewrites replace the file atomically, so a read always sees a whole file.
+    """
     try:
-        with open(CREDS_FILE, 'r') as f:
-            fcntl.flock(f.fileno(), fcntl.LOCK_SH)
-            try:
-                return json.load(f)
-            finally:
-                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
-    except (json.JSONDecodeError, OSError) as e:
+        with open(CREDS_FILE, 'rb') as f:
+            return orjson.loads(f.read())
+    except FileNotFoundError:
+        return None
+    except (orjson.JSONDecodeError, OSError) as e:
         logger.error("[WhatsApp Monitor] Error reading credentials: %s", e)
         return None
 
 
+def _invalidate_status_cache() -> None:
+    global _status_cache
+    _status_cache = None
+
+
+def _may_need_fix() -> bool:
+    """
+    Cheap byte scan of creds.json that rules out the common no-op case.
+
+    Returns False when the file is empty or has a "registered" key and no
+    `"registered": false` anywhere, so the parse and the exclusive lock can
+    be skipped. A file without the key at all still needs the full check.
+    """
+    with open(CREDS_FILE, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return False
+        with mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ) as mm:
+            return _REGISTERED_FALSE_RE.search(mm) is not None or mm.find(b'"registered"') < 0
+
+
 def fix_registered_flag() -> bool:
     """Fix Baileys registered=false bug. Returns True if fix applied."""
     logger.debug("[WhatsApp Monitor] Checking credentials file: %s", CREDS_FILE)
 
-    if not CREDS_FILE.exists():
-        logger.debug("[WhatsApp Monitor] Credentials file does not exist - no WhatsApp linked yet")
-        return False
-
     try:
+        if not _may_need_fix():
+            return False
+
         # Use exclusive lock for read-modify-write to prevent race conditions
-        with open(CREDS_FILE, 'r+') as f:
+        with open(CREDS_FILE, 'r+b') as f:
             fcntl.flock(f.fileno(), fcntl.LOCK_EX)
             try:
-                creds = json.load(f)
+                creds = orjson.loads(f.read())
 
                 has_account = bool(creds.get("account"))
                 has_me = bool(creds.get("me", {}).get("id"))
@@ -48,24 +79,26 @@ def fix_registered_flag() -> bool:
                 if has_account and has_me and not registered:
                     phone_id = creds.get("me", {}).get("id", "unknown")
                     logger.info("[WhatsApp Monitor] DETECTED registered=false bug for %s, fixing...", phone_id)
+                    # Full atomic rewrite: the gateway rewrites creds.json without
+                    # our lock, so patching bytes at offsets from our read could
+                    # corrupt a newer file; this path runs about once per link
                     creds["registered"] = True
-                    f.seek(0)
-                    json.dump(creds, f)
-                    f.truncate()
+                    atomic_write(str(CREDS_FILE), orjson.dumps(creds))
+                    _invalidate_status_cache()
                     logger.info("[WhatsApp Monitor] Fixed registered=false for %s", phone_id)
                     return True
             finally:
                 fcntl.flock(f.fileno(), fcntl.LOCK_UN)
 
+    except FileNotFoundError:
+        logger.debug("[WhatsApp Monitor] Credentials file does not exist - no WhatsApp linked yet")
     except Exception as e:
         logger.error("[WhatsApp Monitor] Error reading/fixing credentials: %s", e)
 
     return False
 
 
-def get_whatsapp_status() -> dict:
-    """Get basic WhatsApp status."""
-    creds = _read_creds_locked()
+def _status_from_creds(creds: dict | None) -> dict:
     if creds is None:
         return {"linked": False, "phone": None, "registered": False}
 
@@ -83,3 +116,29 @@ def get_whatsapp_status() -> dict:
     except Exception as e:
         logger.error("[WhatsApp Monitor] Error getting status: %s", e)
         return {"linked": False, "phone": None, "registered": False}
+
+
+def get_whatsapp_status() -> dict:
+    """
+    Get basic WhatsApp status.
+
+    The parsed status is reused while creds.json keeps the same inode, mtime
+    and size, so repeated polls of an unchanged file cost a single stat().
+    """
+    global _status_cache
+    try:
+        st = os.stat(CREDS_FILE)
+    except FileNotFoundError:
+        return _status_from_creds(None)
+    except OSError:
+        st = None
+
+    key = (st.st_ino, st.st_mtime_ns, st.st_size) if st else None
+    cached = _status_cache
+    if key is not None and cached is not None and cached[0] == key:
+        return dict(cached[1])
+
+    status = _status_from_creds(_read_creds())
+    if key is not None:
+        _status_cache = (key, status)
+    return dict(status)